@@ -0,0 +1,454 @@
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import neat
+import numpy as np
+
+import champion
+import checkpoint
+import courses
+import decision_table
+import engine
+from batch_net import BatchNetwork
+
+local_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(local_dir, 'config-feedforward.txt')
+SEED = 1234
+POPULATIONS = (50, 500, 5000)
+
+
+def load_config(config_file=CONFIG_PATH):
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              config_file)
+
+
+def make_genomes(config, size, mutations=20, seed=0):
+    """ Builds ``size`` genomes with some hidden structure, so inference is not a single layer. """
+    random.seed(seed)
+    genomes = []
+    for key in range(size):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        for _ in range(mutations):
+            genome.mutate(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+def make_inputs(size, ticks, seed=0):
+    rng = np.random.default_rng(seed)
+    inputs = np.empty((ticks, size, 3), dtype=np.float64)
+    inputs[:, :, 0] = rng.uniform(0, 800, (ticks, size))
+    inputs[:, :, 1] = rng.integers(50, 450, (ticks, 1))
+    inputs[:, :, 2] = inputs[:, :, 1] + 200
+    return inputs
+
+
+def bench_activation(config, size=500, ticks=100):
+    """ Activations per second of per-genome FeedForwardNetwork.activate against one BatchNetwork. """
+    genomes = make_genomes(config, size)
+    inputs = make_inputs(size, ticks)
+
+    start = time.perf_counter()
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    create_nets = time.perf_counter() - start
+    expected = np.empty((ticks, size))
+    start = time.perf_counter()
+    for t in range(ticks):
+        rows = inputs[t].tolist()
+        for i, net in enumerate(nets):
+            expected[t, i] = net.activate(rows[i])[0]
+    activate_nets = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = BatchNetwork.create(genomes, config)
+    create_batch = time.perf_counter() - start
+    actual = np.empty((ticks, size))
+    start = time.perf_counter()
+    for t in range(ticks):
+        actual[t] = batch.activate(inputs[t])[:, 0]
+    activate_batch = time.perf_counter() - start
+
+    return {
+        'size': size,
+        'ticks': ticks,
+        'create_nets_s': create_nets,
+        'create_batch_s': create_batch,
+        'nets_activations_per_s': size * ticks / activate_nets,
+        'batch_activations_per_s': size * ticks / activate_batch,
+        'max_abs_error': float(np.abs(actual - expected).max()),
+        'decision_mismatches': int(((actual > 0.5) != (expected > 0.5)).sum()),
+    }
+
+
+def _python_seconds(code, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=local_dir, check=True, timeout=60,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_startup(modules=('engine', 'parallel', 'flappy_bird', 'flappy_bird_cv', 'visualize'), repeat=5):
+    """ Seconds to import each module in a fresh interpreter, on top of bare interpreter startup. """
+    bare = _python_seconds('pass', repeat)
+    return {module: _python_seconds('import ' + module, repeat) - bare for module in modules}
+
+
+def bench_champion(config, decisions=20000, repeat=5, birds=5000):
+    """
+    Load time and per-decision latency of an exported champion against a pickled FeedForwardNetwork,
+    and of its decision table, one bird at a time and ``birds`` at once.
+    """
+    genome = make_genomes(config, 1, mutations=40)[0]
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, 'best.pickle')
+        npz_path = os.path.join(tmp, 'best.npz')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(net, f)
+        champion.export(genome, config, npz_path)
+
+        load_pickle = ("import pickle\nwith open({0!r}, 'rb') as f:\n    pickle.load(f)".format(pickle_path))
+        load_npz = "import champion\nchampion.load({0!r})".format(npz_path)
+        result = {
+            'pickle_cold_load_s': _python_seconds(load_pickle, repeat),
+            'npz_cold_load_s': _python_seconds(load_npz, repeat),
+            'pickle_bytes': os.path.getsize(pickle_path),
+            'npz_bytes': os.path.getsize(npz_path),
+        }
+        start = time.perf_counter()
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+        result['pickle_warm_load_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        best = champion.load(npz_path)
+        result['npz_warm_load_s'] = time.perf_counter() - start
+
+    inputs = make_inputs(1, decisions)[:, 0, :].tolist()
+    for name, model in (('pickle', net), ('npz', best)):
+        start = time.perf_counter()
+        for row in inputs:
+            model.activate(row)
+        result[name + '_decision_us'] = (time.perf_counter() - start) / decisions * 1e6
+
+    start = time.perf_counter()
+    table = decision_table.build(best)
+    result['table_build_s'] = time.perf_counter() - start
+    # The table only holds the states a bird can be in, so y is snapped to its grid.
+    states = [(round(min(y, decision_table.Y_MAX) * 2) / 2, h, b) for y, h, b in inputs]
+    start = time.perf_counter()
+    for row in states:
+        table.activate(row)
+    result['table_decision_us'] = (time.perf_counter() - start) / decisions * 1e6
+    y = np.array([row[0] for row in states[:birds]])
+    alive = np.ones(len(y), dtype=bool)
+    start = time.perf_counter()
+    for row in states[:100]:
+        table.decide(y, row[1], alive)
+    result['table_batch_decisions_per_s'] = 100 * len(y) / (time.perf_counter() - start)
+    return result
+
+
+def bench_simulation(size=500, ticks=2000, seed=SEED):
+    """ Physics and collision ticks per second with a fixed steering rule instead of networks. """
+    sim = engine.Simulation(size, course=courses.Course.generate(seed))
+    rng = np.random.default_rng(seed)
+    offsets = rng.uniform(20, 180, size)
+
+    def decide(y, pipe_height, alive):
+        return y > pipe_height + offsets
+
+    start = time.perf_counter()
+    while sim.ticks < ticks and sim.flock.alive.any():
+        sim.step(decide)
+    elapsed = time.perf_counter() - start
+    return {
+        'size': size,
+        'ticks': sim.ticks,
+        'ticks_per_s': sim.ticks / elapsed,
+        'bird_ticks_per_s': size * sim.ticks / elapsed,
+    }
+
+
+def bench_generation(config, size, generations=5, seed=SEED):
+    """
+    Wall time per generation of a seeded NEAT run of ``size`` genomes on a fixed course, evaluated
+    the way ``engine.eval_genomes`` does it. Later generations survive longer, so several are averaged.
+    The fitness threshold is ignored, so every one of the ``generations`` is played.
+    """
+    course = courses.Course.generate(seed)
+    totals = {'wall_s': 0.0, 'generations': 0, 'ticks': 0, 'genomes': 0, 'activations': 0}
+
+    def eval_genomes(genomes, config):
+        start = time.perf_counter()
+        net = BatchNetwork.create([genome for genome_id, genome in genomes], config)
+        sim = engine.Simulation(len(net), course=course)
+        policy = engine.batch_policy(net)
+
+        def decide(y, pipe_height, alive):
+            totals['activations'] += int(alive.sum())
+            return policy(y, pipe_height, alive)
+
+        sim.run(decide)
+        for (genome_id, genome), fitness in zip(genomes, sim.fitness.tolist()):
+            genome.fitness = fitness
+        totals['wall_s'] += time.perf_counter() - start
+        totals['generations'] += 1
+        totals['ticks'] += sim.ticks
+        totals['genomes'] += len(genomes)
+
+    random.seed(seed)
+    pop_size, no_fitness_termination = config.pop_size, config.no_fitness_termination
+    config.pop_size = size
+    config.no_fitness_termination = True
+    try:
+        neat.Population(config).run(eval_genomes, generations)
+    finally:
+        config.pop_size, config.no_fitness_termination = pop_size, no_fitness_termination
+    wall = totals['wall_s']
+    return {
+        'size': size,
+        'generations': totals['generations'],
+        'wall_s': wall / totals['generations'],
+        'ticks': totals['ticks'],
+        'ticks_per_s': totals['ticks'] / wall,
+        'genome_evals_per_s': totals['genomes'] / wall,
+        'activations_per_s': totals['activations'] / wall,
+    }
+
+
+def bench_checkpoint(config, size=5000, generations=3, seed=SEED):
+    """
+    Seconds to checkpoint and resume a population of ``size`` genomes evolved for a few generations:
+    the pause on the training thread, the background write, and loading it back into a Population.
+    """
+    def eval_genomes(genomes, config):
+        for genome_id, genome in genomes:
+            genome.fitness = random.random()
+
+    random.seed(seed)
+    pop_size = config.pop_size
+    config.pop_size = size
+    try:
+        population = neat.Population(config)
+        population.run(eval_genomes, generations)
+    finally:
+        config.pop_size = pop_size
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.checkpoint')
+        start = time.perf_counter()
+        data = checkpoint.dumps(checkpoint.snapshot(population, course=courses.Course.generate(seed)))
+        pause = time.perf_counter() - start
+        start = time.perf_counter()
+        checkpoint.write(path, data)
+        write = time.perf_counter() - start
+        start = time.perf_counter()
+        checkpoint.restore(checkpoint.load(path), config)
+        load = time.perf_counter() - start
+        size_bytes = os.path.getsize(path)
+    return {
+        'size': size,
+        'pause_s': pause,
+        'write_s': write,
+        'load_s': load,
+        'bytes': size_bytes,
+    }
+
+
+def _peak_rss_mb():
+    import resource
+
+    # Kilobytes on Linux, bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def bench_stress(config, size=100000, mutations=5, seed=SEED):
+    """
+    One headless generation of ``size`` genomes on a fixed course, as ``engine.eval_genomes`` plays it,
+    with the peak RSS of this process after creating the genomes, compiling them and simulating.
+    Run it in a fresh process (``--stress``) so the peaks are its own.
+    """
+    start = time.perf_counter()
+    genomes = make_genomes(config, size, mutations, seed)
+    result = {'size': size, 'genomes_s': time.perf_counter() - start, 'genomes_rss_mb': _peak_rss_mb()}
+    start = time.perf_counter()
+    net = BatchNetwork.create(genomes, config)
+    result['compile_s'] = time.perf_counter() - start
+    result['compile_rss_mb'] = _peak_rss_mb()
+    sim = engine.Simulation(len(net), course=courses.Course.generate(seed))
+    policy = engine.batch_policy(net)
+    flown = [0]
+
+    def decide(y, pipe_height, alive):
+        flown[0] += int(np.count_nonzero(alive))
+        return policy(y, pipe_height, alive)
+
+    start = time.perf_counter()
+    sim.run(decide)
+    wall = time.perf_counter() - start
+    result.update(simulate_s=wall, ticks=sim.ticks, ticks_per_s=sim.ticks / wall, bird_ticks_per_s=flown[0] / wall,
+                  peak_rss_mb=_peak_rss_mb())
+    return result
+
+
+def _frame_scene(birds, seed):
+    rng = random.Random(seed)
+    flock = np.array([rng.uniform(0, 770) for _ in range(birds)])
+    pipes = [engine.Pipe(x, rng.randrange(50, 450)) for x in (150, 450)]
+    return flock, pipes
+
+
+def bench_render(frames=300, birds=50, seed=SEED):
+    """ Frames per second of the pygame and OpenCV renderers drawing the same scene; no window is opened. """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    result = {'frames': frames, 'birds': birds}
+
+    try:
+        import flappy_bird
+    except ImportError:
+        result['pygame_fps'] = None
+    else:
+        renderer = flappy_bird.PygameRenderer()
+        renderer.open()
+        flock, pipes = _frame_scene(birds, seed)
+        start = time.perf_counter()
+        for frame in range(frames):
+            renderer.render(flock, pipes, frame, 1)
+        result['pygame_fps'] = frames / (time.perf_counter() - start)
+
+    try:
+        import flappy_bird_cv
+    except ImportError:
+        result['opencv_fps'] = None
+    else:
+        renderer = flappy_bird_cv.OpenCVRenderer(window=False)
+        flock, pipes = _frame_scene(birds, seed)
+        start = time.perf_counter()
+        for frame in range(frames):
+            renderer.render(flock, pipes, frame, 1)
+        result['opencv_fps'] = frames / (time.perf_counter() - start)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=local_dir, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, prefix=''):
+    """ Prints new/old ratios for every numeric result present in both runs. """
+    for key, value in new.items():
+        if key not in old:
+            continue
+        if isinstance(value, dict):
+            compare(old[key], value, prefix + key + '.')
+        elif isinstance(value, list):
+            for i, (a, b) in enumerate(zip(old[key], value)):
+                compare(a, b, '{0}{1}[{2}].'.format(prefix, key, i))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and old[key]:
+            print('{0:<45} {1:>14.4g} -> {2:<14.4g} x{3:.2f}'.format(prefix + key, old[key], value,
+                                                                     value / old[key]))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure simulation, inference and rendering throughput.")
+    parser.add_argument('--output', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="print ratios against an earlier --output file")
+    parser.add_argument('--quick', action='store_true', help="skip the startup and champion benchmarks "
+                                                             "and the 5000-genome population")
+    parser.add_argument('--stress', type=int, nargs='?', const=100000, metavar='N',
+                        help="only play one generation of N genomes (default 100,000) and report peak memory")
+    args = parser.parse_args()
+    if args.stress:
+        r = bench_stress(load_config(), args.stress)
+        print('{size:,} genomes: created in {genomes_s:.1f} s (peak {genomes_rss_mb:.0f} MB), compiled in '
+              '{compile_s:.1f} s (peak {compile_rss_mb:.0f} MB), {ticks} ticks in {simulate_s:.1f} s, '
+              '{ticks_per_s:,.0f} ticks/s ({bird_ticks_per_s:,.0f} bird-ticks/s), '
+              'peak RSS {peak_rss_mb:.0f} MB'.format(**r))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'stress': r}, f, indent=2)
+        raise SystemExit(0)
+    populations = POPULATIONS[:-1] if args.quick else POPULATIONS
+
+    results = {
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'neat': getattr(neat, '__version__', None),
+        'seed': SEED,
+    }
+    config = load_config()
+
+    if not args.quick:
+        results['startup_s'] = bench_startup()
+        for module, seconds in results['startup_s'].items():
+            print('import {:<15} {:>7.1f} ms'.format(module, seconds * 1000))
+
+        r = results['champion'] = bench_champion(config)
+        print('champion: cold load pickle {0:.1f} ms / npz {1:.1f} ms, warm load pickle {2:.2f} ms / npz {3:.2f} ms, '
+              'decision pickle {4:.2f} us / npz {5:.2f} us / table {6:.2f} us'.format(
+                  r['pickle_cold_load_s'] * 1000, r['npz_cold_load_s'] * 1000,
+                  r['pickle_warm_load_s'] * 1000, r['npz_warm_load_s'] * 1000,
+                  r['pickle_decision_us'], r['npz_decision_us'], r['table_decision_us']))
+        print('decision table: built in {0:.2f} sec, {1:,.0f} batched decisions/s'.format(
+            r['table_build_s'], r['table_batch_decisions_per_s']))
+
+        r = results['checkpoint'] = bench_checkpoint(config)
+        print('checkpoint {size} genomes: pause {0:.1f} ms, write {1:.1f} ms, load {2:.1f} ms, {bytes:,} bytes'.format(
+            r['pause_s'] * 1000, r['write_s'] * 1000, r['load_s'] * 1000, **r))
+
+    results['activation'] = []
+    for size in populations:
+        r = bench_activation(config, size, ticks=20 if size > 500 else 100)
+        results['activation'].append(r)
+        print('pop {size:>5}: FeedForwardNetwork {nets_activations_per_s:>12,.0f}/s  '
+              'BatchNetwork {batch_activations_per_s:>12,.0f}/s  '
+              'x{speedup:.1f}  max error {max_abs_error:.1e}  '
+              'decision mismatches {decision_mismatches}'.format(
+                  speedup=r['batch_activations_per_s'] / r['nets_activations_per_s'], **r))
+
+    results['simulation'] = []
+    for size in populations:
+        r = bench_simulation(size)
+        results['simulation'].append(r)
+        print('pop {size:>5}: simulation {ticks_per_s:>10,.0f} ticks/s  '
+              '{bird_ticks_per_s:>12,.0f} bird-ticks/s over {ticks} ticks'.format(**r))
+
+    results['generation'] = []
+    for size in populations:
+        r = bench_generation(config, size)
+        results['generation'].append(r)
+        print('pop {size:>5}: generation {wall_s:>8.3f} s  {ticks_per_s:>8,.0f} ticks/s  '
+              '{genome_evals_per_s:>10,.0f} genomes/s  {activations_per_s:>12,.0f} activations/s '
+              'over {generations} generations'.format(**r))
+
+    r = results['render'] = bench_render()
+    print('render {birds} birds: pygame {0} fps  OpenCV {1} fps'.format(
+        *('{0:,.0f}'.format(fps) if fps is not None else 'n/a' for fps in (r['pygame_fps'], r['opencv_fps'])), **r))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -0,0 +1,84 @@
+"""
+The best network exported as flat NumPy arrays in an ``.npz`` file.
+
+The file holds the evaluation order, weights, biases and activation names produced by
+``batch_net.compile_genome``, so loading and running it needs NumPy but not neat or pickle. It also holds the
+decision interval the champion was trained with, which ``run_best`` plays it at.
+"""
+import math
+import os
+
+import numpy as np
+
+from batch_net import LINK_FIELDS, NODE_FIELDS, BatchNetwork, compile_genome
+
+FORMAT_VERSION = 2
+BEST_PATH = "best.npz"
+
+# Scalar versions of neat.activations for single decisions, where per-call NumPy overhead would dominate.
+SCALAR_ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, 5.0 * z)))),
+    'tanh': lambda z: math.tanh(max(-60.0, min(60.0, 2.5 * z))),
+    'sin': lambda z: math.sin(max(-60.0, min(60.0, 5.0 * z))),
+    'gauss': lambda z: math.exp(-5.0 * max(-3.4, min(3.4, z)) ** 2),
+    'relu': lambda z: z if z > 0.0 else 0.0,
+    'softplus': lambda z: 0.2 * math.log(1 + math.exp(max(-60.0, min(60.0, 5.0 * z)))),
+    'identity': lambda z: z,
+    'clamped': lambda z: max(-1.0, min(1.0, z)),
+    'abs': abs,
+    'hat': lambda z: max(0.0, 1 - abs(z)),
+    'square': lambda z: z ** 2,
+    'cube': lambda z: z ** 3,
+}
+
+
+def export(genome, config, path=BEST_PATH, interval=1):
+    record = compile_genome(genome, config)
+    arrays = {name: np.asarray(record[name]) for name in NODE_FIELDS + LINK_FIELDS}
+    arrays['activation'] = np.asarray(record['activation'], dtype=str)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, version=FORMAT_VERSION, num_inputs=config.genome_config.num_inputs,
+             num_outputs=config.genome_config.num_outputs, slots=record['slots'], interval=interval, **arrays)
+    os.replace(tmp, path)
+
+
+class Champion:
+    """ A loaded champion; ``activate`` has the same signature as ``neat.nn.FeedForwardNetwork.activate``. """
+
+    def __init__(self, record, num_inputs, num_outputs, interval=1):
+        self.record = record
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        # Ticks between the decisions it was trained to make.
+        self.interval = interval
+        self.values = [0.0] * record['slots']
+        links = [[] for _ in record['node_slot']]
+        for src, node, weight in zip(record['link_src'], record['link_node'], record['link_weight']):
+            links[node].append((src, weight))
+        self.node_evals = [(slot, SCALAR_ACTIVATIONS[activation], bias, response, node_links)
+                           for slot, activation, bias, response, node_links
+                           in zip(record['node_slot'], record['activation'], record['bias'], record['response'], links)]
+
+    def network(self, size=1):
+        """ A BatchNetwork running ``size`` copies of the champion, e.g. one per concurrent player. """
+        return BatchNetwork.pack([self.record] * size, self.num_inputs, self.num_outputs)
+
+    def activate(self, inputs):
+        values = self.values
+        values[:self.num_inputs] = inputs
+        for slot, activation, bias, response, links in self.node_evals:
+            s = 0.0
+            for src, weight in links:
+                s += values[src] * weight
+            values[slot] = activation(bias + response * s)
+        return values[self.num_inputs:self.num_inputs + self.num_outputs]
+
+
+def load(path=BEST_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported champion format version {0} in {1!r}".format(version, path))
+        record = {name: data[name].tolist() for name in NODE_FIELDS + LINK_FIELDS}
+        record['slots'] = int(data['slots'])
+        return Champion(record, int(data['num_inputs']), int(data['num_outputs']), int(data['interval']))
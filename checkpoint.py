@@ -0,0 +1,188 @@
+"""
+Checkpoints of a training run, written in the background so training does not wait for the disk.
+
+A checkpoint holds what a ``neat.Population`` needs to carry on as if it had never stopped: the next
+generation's genomes and species, the genome, node and species counters, the ancestry, the best genome so far
+and the global random state, plus the lineage streaks, the tick cap and the pipe course. The state is pickled on the
+training thread at the end of a generation, the one moment it is consistent, then compressed and written
+by a background thread to a temporary file that replaces the checkpoint in one step. A crash therefore
+leaves the previous checkpoint intact.
+"""
+import itertools
+import os
+import pickle
+import queue
+import random
+import threading
+import zlib
+
+import numpy as np
+
+import courses
+from instrumentation import Reporter
+
+MAGIC = b'FBCHECKP'
+VERSION = 1
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4')])
+
+
+def peek(counter):
+    """ The next value of an ``itertools.count`` and an equivalent counter that will still yield it. """
+    value = next(counter)
+    return value, itertools.count(value)
+
+
+def snapshot(population, lineage=None, course=None, budget=None):
+    """ Everything needed to resume ``population`` at its next generation, as picklable built-ins and genomes. """
+    reproduction, species_set = population.reproduction, population.species
+    genome_key, reproduction.genome_indexer = peek(reproduction.genome_indexer)
+    species_key, species_set.indexer = peek(species_set.indexer)
+    # neat numbers new nodes from a counter it only creates at the first node mutation.
+    genome_config = population.config.genome_config
+    node_key = None
+    if genome_config.node_indexer is not None:
+        node_key, genome_config.node_indexer = peek(genome_config.node_indexer)
+    return {
+        'generation': population.generation + 1,
+        'population': population.population,
+        'species': species_set.species,
+        'genome_to_species': species_set.genome_to_species,
+        'species_key': species_key,
+        'genome_key': genome_key,
+        'node_key': node_key,
+        'ancestors': reproduction.ancestors,
+        'best_genome': population.best_genome,
+        'random': random.getstate(),
+        'lineage': None if lineage is None else lineage.streaks,
+        'tick_cap': None if budget is None else budget.cap,
+        'course': courses.to_state(course),
+    }
+
+
+def dumps(state):
+    header = np.array([(MAGIC, VERSION)], dtype=HEADER_DTYPE).tobytes()
+    return header + pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write(path, data):
+    """ Compresses ``data`` after its header and moves it into place at ``path`` atomically. """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data[:HEADER_DTYPE.itemsize])
+        f.write(zlib.compress(memoryview(data)[HEADER_DTYPE.itemsize:], 1))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1) if len(data) >= HEADER_DTYPE.itemsize else None
+    if header is None or header['magic'][0] != MAGIC:
+        raise ValueError("{0!r} is not a checkpoint".format(path))
+    if header['version'][0] != VERSION:
+        raise ValueError("Unsupported checkpoint version {0} in {1!r}".format(header['version'][0], path))
+    return pickle.loads(zlib.decompress(memoryview(data)[HEADER_DTYPE.itemsize:]))
+
+
+def restore(state, config):
+    """ A ``neat.Population`` that continues where the checkpointed one left off; also restores the random state. """
+    import neat
+
+    p = neat.Population(config, ({}, None, state['generation']))
+    p.population = state['population']
+    p.species = config.species_set_type(config.species_set_config, p.reporters)
+    p.species.species = state['species']
+    p.species.genome_to_species = state['genome_to_species']
+    p.species.indexer = itertools.count(state['species_key'])
+    p.reproduction.genome_indexer = itertools.count(state['genome_key'])
+    node_key = state['node_key']
+    config.genome_config.node_indexer = None if node_key is None else itertools.count(node_key)
+    p.reproduction.ancestors = state['ancestors']
+    p.best_genome = state['best_genome']
+    random.setstate(state['random'])
+    return p
+
+
+def population(config, resume=None):
+    """ A new ``neat.Population``, or the one saved at ``resume``; also returns the saved state, or None. """
+    if resume is None:
+        import neat
+
+        return neat.Population(config), None
+    state = load(resume)
+    print('Resuming at generation {0} from {1}'.format(state['generation'], resume))
+    return restore(state, config), state
+
+
+class Checkpointer(Reporter):
+    """
+    Saves ``population`` to ``path`` every ``every`` generations, where ``path`` may contain ``{generation}``
+    to keep one file per checkpoint. The training thread only pickles; if the writer is still busy with the
+    previous checkpoint, it waits for that one to finish first.
+    """
+
+    def __init__(self, path, every=1):
+        self.path = path
+        self.every = max(1, every)
+        self.population = None
+        self.lineage = None
+        self.course = None
+        self.budget = None
+        self.saved = 0
+        self.last = None
+        self.error = None
+        self.pending = queue.Queue(1)
+        self.thread = threading.Thread(target=self._drain, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def watch(self, population, lineage=None, course=None, budget=None):
+        """ The population to save, and the lineage tracker, course and tick budget that go with it. """
+        self.population = population
+        self.lineage = lineage
+        self.course = course
+        self.budget = budget
+
+    def _drain(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            path, data = item
+            try:
+                write(path, data)
+            except OSError as e:
+                self.error = e
+                continue
+            self.saved += 1
+            self.last = path
+
+    def end_generation(self, config, population, species_set):
+        if self.error is not None:
+            print('Checkpoint not saved: {0}'.format(self.error))
+            self.error = None
+        p = self.population
+        if p is not None and (p.generation + 1) % self.every == 0:
+            self.pending.put((self.path.format(generation=p.generation + 1),
+                              dumps(snapshot(p, self.lineage, self.course, self.budget))))
+
+    def close(self):
+        """ Waits for the last checkpoint to be on disk. """
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+            if self.saved:
+                print('Saved {0} checkpoints, the last to {1}'.format(self.saved, self.last))
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("checkpoints")
+    group.add_argument('--checkpoint', metavar='PATH',
+                       help="save the population to PATH as training goes; '{generation}' in PATH keeps every one")
+    group.add_argument('--checkpoint-every', type=int, default=1, metavar='N', help="generations between checkpoints")
+    group.add_argument('--resume', metavar='PATH', help="continue the run saved in this checkpoint")
+
+
+def from_args(args):
+    return Checkpointer(args.checkpoint, args.checkpoint_every) if args.checkpoint else None
@@ -0,0 +1,133 @@
+"""
+Checks that the game core plays the same episodes whatever draws them.
+
+A seeded population is trained for a few generations with every tick drawn, once by each frontend's
+renderer as it ships, and once more headless with the null renderer. The pygame and OpenCV runs must play
+exactly the same replay log and fitness values as each other, and as the headless run. Run it after
+touching game.py, engine.py or a renderer.
+"""
+import contextlib
+import io
+import os
+import random
+import tempfile
+
+import neat
+import numpy as np
+
+import champion
+import courses
+import game
+import render_policy
+import replay
+
+FIELDS = ('ids', 'ticks', 'score', 'deaths', 'heights', 'spawns', 'jumps')
+
+
+def play(backend, config, generations, seed, course, path):
+    """ Trains with ``backend`` drawing every generation and logs to ``path``; returns the fitness values. """
+    game.renderer = backend
+    game.course = course
+    game.policy = render_policy.RenderPolicy(fps=0)
+    game.gen = 0
+    game.best_id = None
+    game.replay_log = log = replay.ReplayLog(path)
+    fitness = []
+
+    def evaluate(genomes, config):
+        game.eval_genomes(genomes, config)
+        fitness.append([genome.fitness for genome_id, genome in genomes])
+
+    random.seed(seed)
+    population = neat.Population(config)
+    population.add_reporter(log)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            population.run(evaluate, generations)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            log.close()
+        game.replay_log = None
+    return fitness
+
+
+def differences(expected, actual):
+    """ Where two replay logs disagree, as (episode, field) pairs. """
+    if len(expected) != len(actual):
+        return [(None, 'episodes')]
+    found = []
+    for i in range(len(expected)):
+        a, b = expected.episode(i), actual.episode(i)
+        found.extend((i, field) for field in FIELDS if not np.array_equal(getattr(a, field), getattr(b, field)))
+    return found
+
+
+def backends():
+    """ The renderers to check, by name; those whose library is missing are left out. """
+    found = {}
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        from flappy_bird import PygameRenderer
+    except ImportError:
+        pass
+    else:
+        found['pygame'] = PygameRenderer
+    try:
+        from flappy_bird_cv import OpenCVRenderer
+    except ImportError:
+        pass
+    else:
+        found['opencv'] = lambda: OpenCVRenderer(window=False)
+    return found
+
+
+def check(generations=5, seed=1, course_seed=1):
+    """
+    Returns True when the frontends played exactly the same episodes as each other and as the headless run.
+    Both frontends are needed; with either library missing the check fails.
+    """
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, game.CONFIG_PATH)
+    course = courses.Course.generate(course_seed)
+    makers = backends()
+    passed = len(makers) == 2
+    if not passed:
+        print('Both frontends are needed, but only {0} loaded'.format(', '.join(makers) or 'neither'))
+    makers['headless'] = game.NullRenderer
+    best_path = champion.BEST_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        # Generations that pass the score limit save their best genome; keep that away from the real one.
+        champion.BEST_PATH = os.path.join(tmp, 'best.npz')
+        try:
+            runs = []
+            for name, make in makers.items():
+                backend = make()
+                path = os.path.join(tmp, name + '.replay')
+                runs.append((name, path, play(backend, config, generations, seed, course, path)))
+                backend.close()
+            # Every run is compared with the first, pygame's when it loaded.
+            reference_name, reference_path, reference = runs[0]
+            for name, path, fitness in runs[1:]:
+                found = differences(replay.Replay(reference_path), replay.Replay(path))
+                if fitness != reference:
+                    found.append((None, 'fitness'))
+                passed &= not found
+                outcome = 'same as ' + reference_name
+                if found:
+                    outcome = 'differs from {0} in {1}'.format(reference_name, ', '.join(
+                        field if i is None else '{0} of episode {1}'.format(field, i) for i, field in found[:5]))
+                print('{0:<8} {1} generations: {2}'.format(name, len(fitness), outcome))
+        finally:
+            champion.BEST_PATH = best_path
+    return passed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that both frontends play the same episodes as each other.")
+    parser.add_argument('--generations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1, help="seed of the population")
+    parser.add_argument('--course-seed', type=int, default=1)
+    args = parser.parse_args()
+    raise SystemExit(0 if check(args.generations, args.seed, args.course_seed) else 1)
@@ -0,0 +1,173 @@
+"""
+Seeded pipe courses, generated up front and stored in a small memory-mappable file.
+
+A course file is a fixed header followed by one packed height record per pipe. Workers
+``attach`` to the same file, so they all read the OS page cache instead of receiving a pickled copy.
+"""
+import os
+import random
+
+import numpy as np
+
+MAGIC = b'FBCOURSE'
+VERSION = 2
+DEFAULT_PIPES = 10000
+
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('count', '<u4'), ('seed', '<i8')])
+PIPE_DTYPE = np.dtype([('height', '<i2')])
+
+
+class Course:
+    def __init__(self, pipes, seed=None):
+        self.pipes = pipes
+        self.seed = seed
+        # Heights as a list, read from the pipes once instead of every episode.
+        self._heights = None
+
+    def __len__(self):
+        return len(self.pipes)
+
+    @property
+    def heights(self):
+        return self.pipes['height']
+
+    @staticmethod
+    def generate(seed, count=DEFAULT_PIPES):
+        """ Draws heights with ``random.Random(seed)``, the same sequence a seeded engine.Simulation uses. """
+        rng = random.Random(seed)
+        pipes = np.empty(count, dtype=PIPE_DTYPE)
+        pipes['height'] = [rng.randrange(50, 450) for _ in range(count)]
+        return Course(pipes, seed)
+
+    def pipe_heights(self):
+        """ Yields the heights in order, starting over after the last pipe. """
+        if self._heights is None:
+            self._heights = self.heights.tolist()
+        heights = self._heights
+        while True:
+            for height in heights:
+                yield height
+
+    def save(self, path):
+        header = np.array([(MAGIC, VERSION, len(self.pipes), -1 if self.seed is None else self.seed)],
+                          dtype=HEADER_DTYPE)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(np.ascontiguousarray(self.pipes, dtype=PIPE_DTYPE).tobytes())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        """ Maps a course file read-only; the records are paged in from disk on demand. """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC:
+            raise ValueError("{0!r} is not a course file".format(path))
+        if header['version'][0] != VERSION:
+            raise ValueError("Unsupported course file version {0} in {1!r}".format(header['version'][0], path))
+        count = int(header['count'][0])
+        seed = int(header['seed'][0])
+        pipes = np.memmap(path, dtype=PIPE_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize, shape=(count,))
+        return Course(pipes, None if seed < 0 else seed)
+
+
+class CourseSet(list):
+    """
+    Courses that every genome plays at once. ``engine.simulate`` lays genomes x courses out as one flock, course
+    by course, and ``combine`` reduces each genome's values with ``reduce``: 'mean', 'min', or 'qN' for the
+    Nth percentile across courses.
+    """
+
+    def __init__(self, courses, reduce='mean'):
+        list.__init__(self, courses)
+        if reduce not in ('mean', 'min') and not (reduce.startswith('q') and 0 <= float(reduce[1:]) <= 100):
+            raise ValueError("Unknown fitness reducer {0!r}".format(reduce))
+        self.reduce = reduce
+
+    def bird_heights(self, birds):
+        """ Yields each pipe's height for every bird, when ``birds`` birds play each course in turn. """
+        for heights in zip(*[course.pipe_heights() for course in self]):
+            yield np.repeat(heights, birds)
+
+    def combine(self, fitness):
+        """ One value per genome from a (courses, genomes) fitness array. """
+        if self.reduce == 'mean':
+            return fitness.mean(axis=0)
+        if self.reduce == 'min':
+            return fitness.min(axis=0)
+        return np.quantile(fitness, float(self.reduce[1:]) / 100, axis=0)
+
+
+def to_state(course):
+    """ A small picklable description of a course or CourseSet: seeds where they are known, pipes otherwise. """
+    if course is None:
+        return None
+    if isinstance(course, CourseSet):
+        return ('set', [to_state(each) for each in course], course.reduce)
+    if course.seed is not None:
+        return ('seed', course.seed, len(course))
+    return ('pipes', np.array(course.pipes))
+
+
+def from_state(state):
+    """ Rebuilds what ``to_state`` described. """
+    if state is None:
+        return None
+    if state[0] == 'set':
+        return CourseSet([from_state(each) for each in state[1]], state[2])
+    if state[0] == 'seed':
+        return Course.generate(state[1], state[2])
+    return Course(state[1])
+
+
+_attached = {}
+
+
+def attach(path):
+    """ Course.load, mapped once per process. """
+    if path not in _attached:
+        _attached[path] = Course.load(path)
+    return _attached[path]
+
+
+def add_arguments(parser, sets=True):
+    """ With ``sets`` False only a single course can be chosen, for playing one bird. """
+    group = parser.add_argument_group("pipe course")
+    group.add_argument('--seed', type=int, default=None, help="generate a reproducible course from this seed")
+    group.add_argument('--course', nargs='+', default=None, metavar='PATH',
+                       help="play the course stored in this file; with several files, play them all at once")
+    if not sets:
+        parser.set_defaults(courses=1, reduce='mean')
+        return
+    group.add_argument('--courses', type=int, default=1, metavar='K',
+                       help="score every genome on K courses generated from seeds S..S+K-1 at once")
+    group.add_argument('--reduce', default='mean', metavar='HOW',
+                       help="combine a genome's fitness across courses by 'mean', 'min' or 'qN' (Nth percentile)")
+
+
+def from_args(args):
+    """ A Course, a CourseSet when several courses are asked for, or None for fresh heights every episode. """
+    if args.course:
+        if len(args.course) == 1:
+            return attach(args.course[0])
+        return CourseSet([attach(path) for path in args.course], args.reduce)
+    if args.courses > 1:
+        # The set is fixed for the whole run, so without --seed its first seed is drawn once here.
+        seed = random.randrange(2 ** 32) if args.seed is None else args.seed
+        return CourseSet([Course.generate(seed + k) for k in range(args.courses)], args.reduce)
+    if args.seed is not None:
+        return Course.generate(args.seed)
+    return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a pipe course file.")
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, required=True)
+    parser.add_argument('--pipes', type=int, default=DEFAULT_PIPES)
+    args = parser.parse_args()
+
+    Course.generate(args.seed, args.pipes).save(args.path)
+    print('Saved {0} pipes with seed {1} to {2}'.format(args.pipes, args.seed, args.path))
@@ -0,0 +1,144 @@
+"""
+The champion's jump decision precomputed over every state it can meet, packed into a bit table.
+
+The network sees ``(y, height, height + GAP)``, so its decision is a function of y and the pipe height.
+Heights are integers in [50, 450), and y only takes multiples of 0.5, since the jump velocity and the
+gravity term are multiples of 0.5 and the step is capped at whole pixels. A bird whose y is outside
+[0, WIN_HEIGHT - BIRD_HEIGHT] dies at the end of the tick whatever it decides, so those states are left out.
+"""
+import os
+
+import numpy as np
+
+import champion
+from engine import BIRD_HEIGHT, PIPE_GAP, WIN_HEIGHT
+
+FORMAT_VERSION = 2
+TABLE_PATH = "best.table.npz"
+
+HEIGHT_MIN = 50
+HEIGHT_MAX = 450
+Y_MAX = WIN_HEIGHT - BIRD_HEIGHT
+# Rows per pixel of y.
+Y_STEPS = 2
+
+
+def grid():
+    """ The y values of the table's rows and the heights of its columns. """
+    return np.arange(Y_MAX * Y_STEPS + 1) / Y_STEPS, np.arange(HEIGHT_MIN, HEIGHT_MAX)
+
+
+def build(best, chunk=4096):
+    """ Evaluates ``best``, a ``champion.Champion``, on every state with a BatchNetwork, ``chunk`` states at once. """
+    ys, heights = grid()
+    y, height = np.meshgrid(ys, heights, indexing='ij')
+    inputs = np.stack([y.ravel(), height.ravel(), height.ravel() + PIPE_GAP], axis=1).astype(np.float64)
+    net = best.network(chunk)
+    jump = np.empty(len(inputs), dtype=bool)
+    for start in range(0, len(inputs), chunk):
+        rows = inputs[start:start + chunk]
+        jump[start:start + len(rows)] = net.activate(np.resize(rows, (chunk, 3)))[:len(rows), 0] > 0.5
+    return DecisionTable(jump.reshape(y.shape), best.interval)
+
+
+def verify(table, best):
+    """
+    Runs ``best.activate``, the scalar path ``run_best`` uses, on every state and returns the (y, height)
+    pairs where the table decides otherwise. An empty list means they agree everywhere a decision matters.
+    """
+    ys, heights = grid()
+    heights = heights.tolist()
+    mismatches = []
+    for row, y in enumerate(ys.tolist()):
+        expected = [best.activate((y, height, height + PIPE_GAP))[0] > 0.5 for height in heights]
+        for column in np.flatnonzero(table.bits[row] != expected).tolist():
+            mismatches.append((y, heights[column]))
+    return mismatches
+
+
+def compile_champion(best):
+    """ Builds the table and corrects it wherever it disagrees with the scalar network; returns it and the count. """
+    table = build(best)
+    mismatches = verify(table, best)
+    for y, height in mismatches:
+        table.bits[int(y * Y_STEPS), height - HEIGHT_MIN] = not table.bits[int(y * Y_STEPS), height - HEIGHT_MIN]
+    return table, len(mismatches)
+
+
+class DecisionTable:
+    """
+    ``activate`` has the signature of ``champion.Champion.activate`` and returns 1.0 for a jump, so it
+    drops into ``run_best``; ``decide`` is the vectorized ``engine`` policy, for any number of birds.
+    ``interval`` is the champion's decision interval.
+    """
+
+    def __init__(self, bits, interval=1):
+        self.bits = bits
+        self.interval = interval
+        self.columns = bits.shape[1]
+        # One byte per state, flattened, so a scalar lookup is a single index.
+        self.flat = bits.astype(np.uint8).ravel().tobytes()
+
+    def activate(self, inputs):
+        y, height = inputs[0], inputs[1]
+        if not 0 <= y <= Y_MAX:
+            return [0.0]
+        row = y * Y_STEPS
+        if row != int(row) or not HEIGHT_MIN <= height < HEIGHT_MAX:
+            raise ValueError("State (y={0}, height={1}) is not in the decision table".format(y, height))
+        return [float(self.flat[int(row) * self.columns + int(height) - HEIGHT_MIN])]
+
+    def decide(self, y, pipe_height, alive):
+        inside = (y >= 0) & (y <= Y_MAX)
+        rows = np.where(inside, y * Y_STEPS, 0).astype(np.int64)
+        return inside & self.bits[rows, np.asarray(pipe_height, dtype=np.int64) - HEIGHT_MIN]
+
+    def save(self, path=TABLE_PATH):
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, version=FORMAT_VERSION, rows=self.bits.shape[0], columns=self.columns,
+                            bits=np.packbits(self.bits, axis=None), interval=self.interval)
+        os.replace(tmp, path)
+
+
+def load(path=TABLE_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported decision table version {0} in {1!r}".format(version, path))
+        rows, columns = int(data['rows']), int(data['columns'])
+        bits = np.unpackbits(data['bits'], count=rows * columns).astype(bool).reshape(rows, columns)
+        interval = int(data['interval'])
+    return DecisionTable(bits, interval)
+
+
+def add_arguments(parser):
+    parser.add_argument('--lookup', nargs='?', const=TABLE_PATH, metavar='PATH',
+                        help="let run_best decide from a table built by decision_table.py instead of the network")
+
+
+def from_args(args):
+    return None if args.lookup is None else load(args.lookup)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Precompute the champion's decisions into a lookup table.")
+    parser.add_argument('--champion', default=champion.BEST_PATH, help="exported champion to tabulate")
+    parser.add_argument('--output', default=TABLE_PATH)
+    parser.add_argument('--verify', action='store_true', help="only check the existing table against the champion")
+    args = parser.parse_args()
+
+    best = champion.load(args.champion)
+    start = time.perf_counter()
+    if args.verify:
+        mismatches = verify(load(args.output), best)
+        print('{0} states disagree with {1}'.format(len(mismatches), args.champion))
+        for y, height in mismatches[:10]:
+            print('  y={0} height={1}'.format(y, height))
+        raise SystemExit(1 if mismatches else 0)
+    table, corrected = compile_champion(best)
+    table.save(args.output)
+    print('Verified {0} states in {1:.1f} sec ({2} corrected from the batched pass), saved {3} bytes to {4}'.format(
+        table.bits.size, time.perf_counter() - start, corrected, os.path.getsize(args.output), args.output))
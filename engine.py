@@ -0,0 +1,445 @@
+import os
+import random
+from collections import deque
+
+import numpy as np
+
+import champion
+import courses
+import fitness_cache
+import instrumentation
+from batch_net import BatchNetwork
+
+WIN_WIDTH = 600
+WIN_HEIGHT = 800
+
+BIRD_X = 230
+BIRD_Y = 350
+BIRD_WIDTH = 30
+BIRD_HEIGHT = 30
+JUMP_VEL = -10.5
+
+PIPE_WIDTH = 80
+PIPE_GAP = 200
+PIPE_VEL = 10
+FIRST_PIPE_X = 700
+
+MAX_SCORE = 20
+# Fewest rows batch_policy bothers to compact a network to its live birds.
+COMPACT_MIN = 1024
+
+
+class Flock:
+    """ Struct-of-arrays state of every bird in a generation. """
+
+    def __init__(self, size):
+        self.y = np.full(size, BIRD_Y, dtype=np.float64)
+        self.vel = np.zeros(size, dtype=np.float64)
+        self.tick_count = np.zeros(size, dtype=np.int64)
+        self.alive = np.ones(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.y)
+
+    def jump(self, mask):
+        self.vel[mask] = JUMP_VEL
+        self.tick_count[mask] = 0
+
+    def move(self, rows=None):
+        """ Moves every bird, or only the birds at ``rows``; the others stay where they are. """
+        if rows is None:
+            self.tick_count += 1
+            d = self.vel * self.tick_count + 0.5 * 3 * self.tick_count ** 2
+        else:
+            tick_count = self.tick_count[rows] + 1
+            self.tick_count[rows] = tick_count
+            d = self.vel[rows] * tick_count + 0.5 * 3 * tick_count ** 2
+        np.minimum(d, 16, out=d)
+        d[d < 0] -= 2
+        if rows is None:
+            self.y += d
+        else:
+            self.y[rows] += d
+
+
+def random_heights(rng=random):
+    """ Endless pipe heights drawn on demand from ``rng``. """
+    while True:
+        yield rng.randrange(50, 450)
+
+
+class Pipe:
+    """ One pair of pipes; what the renderers draw, the replay log records and the live view publishes. """
+
+    def __init__(self, x, height):
+        self.x = x
+        self.height = height
+        self.bottom = self.height + PIPE_GAP
+        self.passed = False
+
+    def move(self):
+        self.x -= PIPE_VEL
+
+
+class Simulation:
+    """
+    Steps a whole population through one episode with vectorized physics and collision.
+
+    The bird rect is truncated to integers before testing, as ``pygame.Rect`` does and both renderers draw it.
+    Pipe heights come from a precomputed ``course`` (see courses.py) or from ``random.Random(seed)``;
+    with neither they are drawn from the global ``random`` state. With a CourseSet, ``size`` birds are
+    split evenly across its courses and every pipe's height is an array with one entry per bird.
+    ``timer`` is an ``instrumentation.PhaseTimer`` charged with the time of each phase of a step, and
+    every tick is published to ``live``, a ``snapshots.LiveView`` or ``game.Screen``, and to ``record``, a
+    ``replay.EpisodeRecorder``, when they are given; a ``live`` whose ``publish`` returns False, as a closed
+    window does, ends the episode. Birds decide on every ``interval``-th tick and repeat
+    that decision in between, and ``run`` stops after ``max_ticks`` ticks, setting ``capped``.
+    """
+
+    def __init__(self, size, seed=None, course=None, timer=instrumentation.NO_TIMER, live=None, record=None,
+                 interval=1, max_ticks=None):
+        self.flock = Flock(size)
+        self.fitness = np.zeros(size, dtype=np.float64)
+        if isinstance(course, courses.CourseSet):
+            self.heights = course.bird_heights(size // len(course))
+        elif course is not None:
+            self.heights = course.pipe_heights()
+        else:
+            self.heights = random_heights(random if seed is None else random.Random(seed))
+        self.pipes = deque([Pipe(FIRST_PIPE_X, next(self.heights))])
+        # Birds that physics still moves, once most have died; dead birds' positions no longer matter.
+        self.moving = None
+        self.score = 0
+        self.ticks = 0
+        self.interval = interval
+        self.max_ticks = max_ticks
+        self.capped = False
+        self.stopped = False
+        # Networks queried, one per live bird per decision tick, and the decision held until the next one.
+        self.activations = 0
+        self.jump = None
+        self.timer = timer
+        self.live = live
+        if live is not None:
+            live.new_episode()
+        self.record = record
+
+    def pipe_index(self):
+        if len(self.pipes) > 1 and BIRD_X > self.pipes[0].x + PIPE_WIDTH:
+            return 1
+        return 0
+
+    def collide(self, pipe):
+        """ Birds hitting ``pipe``, or None when the pipe does not span the birds' column. """
+        if not (BIRD_X < pipe.x + PIPE_WIDTH and BIRD_X + BIRD_WIDTH > pipe.x):
+            return None
+        top = np.trunc(self.flock.y)
+        bottom = top + BIRD_HEIGHT
+        return ((top < pipe.height) & (bottom > 0)) | ((top < WIN_HEIGHT) & (bottom > pipe.bottom))
+
+    def step(self, decide):
+        flock = self.flock
+        alive = flock.alive
+        timer = self.timer
+        t = timer.clock()
+        pipe = self.pipes[self.pipe_index()]
+
+        self.fitness[alive] += 0.1
+        moving = self.moving
+        if len(flock) >= COMPACT_MIN:
+            live = alive if moving is None else alive[moving]
+            if 2 * np.count_nonzero(live) <= len(live):
+                moving = self.moving = np.flatnonzero(alive)
+        flock.move(moving)
+        t = timer.lap('physics', t)
+        if self.ticks % self.interval == 0:
+            self.jump = decide(flock.y, pipe.height, alive)
+            self.activations += int(np.count_nonzero(alive))
+        t = timer.lap('activate', t)
+        jumped = alive & self.jump
+        flock.jump(jumped)
+
+        add_pipe = False
+        for pipe in self.pipes:
+            pipe.move()
+            hit = self.collide(pipe)
+            if hit is not None:
+                hit &= alive
+                self.fitness[hit] -= 1
+                alive &= ~hit
+            if not pipe.passed and pipe.x < BIRD_X and alive.any():
+                pipe.passed = True
+                add_pipe = True
+        t = timer.lap('collide', t)
+        if add_pipe:
+            self.score += 1
+            self.fitness[alive] += 5
+            self.pipes.append(Pipe(WIN_WIDTH, next(self.heights)))
+        while self.pipes[0].x + PIPE_WIDTH < 0:
+            self.pipes.popleft()
+        t = timer.lap('pipes', t)
+
+        y = flock.y
+        alive &= (y >= 0) & (y + BIRD_HEIGHT <= WIN_HEIGHT)
+        self.ticks += 1
+        timer.lap('collide', t)
+        if self.live is not None and self.live.publish(self.score, y, alive, self.pipes) is False:
+            self.stopped = True
+        if self.record is not None:
+            self.record.tick(jumped, alive, self.pipes)
+
+    def run(self, decide, max_score=None):
+        """ Plays until every bird is dead or the score passes ``max_score``, ``MAX_SCORE`` when it is None. """
+        if max_score is None:
+            max_score = MAX_SCORE
+        while self.flock.alive.any() and not self.stopped:
+            self.step(decide)
+            if self.score > max_score:
+                break
+            if self.max_ticks is not None and self.ticks >= self.max_ticks:
+                self.capped = bool(self.flock.alive.any())
+                break
+        self.timer.count(self.ticks, len(self.flock) - int(self.flock.alive.sum()))
+        if self.record is not None:
+            self.record.finish(self.score)
+        return self.fitness
+
+
+def net_policy(nets):
+    """ Wraps one neat network per bird into a ``decide(y, pipe_height, alive)`` callable. """
+
+    def decide(y, pipe_height, alive):
+        jump = np.zeros(len(nets), dtype=bool)
+        ys = y.tolist()
+        for i in np.flatnonzero(alive).tolist():
+            output = nets[i].activate((ys[i], pipe_height, pipe_height + PIPE_GAP))
+            jump[i] = output[0] > 0.5
+        return jump
+
+    return decide
+
+
+def batch_policy(net):
+    """
+    Evaluates a BatchNetwork for every live bird in one call per tick. Whenever half of the rows left belong
+    to dead birds, the network is cut down to the live ones, so a large population that mostly dies early
+    stops paying for its dead.
+    """
+    # Bird of each row of the current network.
+    state = {'net': net, 'rows': np.arange(len(net)), 'inputs': np.empty((len(net), 3), dtype=np.float64)}
+
+    def decide(y, pipe_height, alive):
+        net, rows, inputs = state['net'], state['rows'], state['inputs']
+        live = alive[rows]
+        if 2 * np.count_nonzero(live) <= len(rows) and len(rows) >= COMPACT_MIN:
+            net = state['net'] = net.select(live)
+            rows = state['rows'] = rows[live]
+            inputs = state['inputs'] = np.empty((len(rows), 3), dtype=np.float64)
+        if np.ndim(pipe_height):
+            pipe_height = pipe_height[rows]
+        inputs[:, 0] = y[rows]
+        inputs[:, 1] = pipe_height
+        inputs[:, 2] = pipe_height + PIPE_GAP
+        jump = np.zeros(len(y), dtype=bool)
+        jump[rows] = net.activate(inputs)[:, 0] > 0.5
+        return jump
+
+    return decide
+
+
+def best_alive(sim):
+    """ Index of the fittest bird still alive; ties go to the lowest index. """
+    alive = np.flatnonzero(sim.flock.alive)
+    return int(alive[np.argmax(sim.fitness[alive])])
+
+
+def simulate(genomes, config, seed=None, course=None, timer=instrumentation.NO_TIMER, live=None, log=None,
+             budget=None):
+    """
+    Plays one episode with every genome in the list (on each course of a CourseSet) and returns the Simulation.
+    The episode is written to ``log``, a ``replay.ReplayLog``, when one is given, and played with the decision
+    interval and tick cap of ``budget``, a ``tick_budget.TickBudget``, which is told what it used.
+    """
+    t = timer.clock()
+    copies = len(course) if isinstance(course, courses.CourseSet) else 1
+    net = BatchNetwork.create(genomes, config, copies)
+    timer.lap('create', t)
+    record = None if log is None else log.episode([genome.key for genome in genomes] * copies, copies)
+    if budget is None:
+        sim = Simulation(len(net), seed, course, timer, live, record)
+    else:
+        sim = Simulation(len(net), seed, course, timer, live, record, budget.interval, budget.cap)
+    sim.run(batch_policy(net))
+    if budget is not None:
+        budget.observe(sim.ticks, sim.activations, sim.capped)
+    return sim
+
+
+def genome_fitness(sim, course):
+    """ Fitness per genome, combined across courses when ``course`` is a CourseSet. """
+    if isinstance(course, courses.CourseSet):
+        return course.combine(sim.fitness.reshape(len(course), -1))
+    return sim.fitness
+
+
+def genome_finished(sim, course):
+    """ Per genome, whether a bird of it was still flying when the episode stopped at the score limit. """
+    alive = sim.flock.alive
+    if isinstance(course, courses.CourseSet):
+        alive = alive.reshape(len(course), -1).any(axis=0)
+    return alive & (sim.score > MAX_SCORE)
+
+
+def episode_results(sim, course):
+    """ (fitness, finished) per genome, the pairs ``assign`` and ``fitness_cache.FitnessCache`` take. """
+    return list(zip(genome_fitness(sim, course).tolist(), genome_finished(sim, course).tolist()))
+
+
+def assign(genomes, results, config, interval=1):
+    """
+    Sets each genome's fitness and saves the fittest finished genome, the first one on ties, as trained
+    with decision ``interval``.
+    """
+    for (genome_id, genome), (fitness, finished) in zip(genomes, results):
+        genome.fitness = fitness
+    finished = [i for i, (fitness, done) in enumerate(results) if done]
+    if finished:
+        save_best(genomes[max(finished, key=lambda i: results[i][0])][1], config, interval)
+
+
+def save_best(genome, config, interval=1):
+    champion.export(genome, config, champion.BEST_PATH, interval)
+    print('save {0}'.format(champion.BEST_PATH))
+
+
+def eval_genomes(genomes, config, seed=None, course=None, timer=instrumentation.NO_TIMER, live=None, cache=None,
+                 log=None, budget=None):
+    """
+    Headless drop-in for the frontends' eval_genomes; assigns the same fitness values. With a
+    ``fitness_cache.FitnessCache`` and a fixed course, genomes already played on it are not played again,
+    so they are not in ``log`` either.
+    """
+    scope = None if cache is None else fitness_cache.course_key(course, seed)
+    interval = 1
+    if budget is not None:
+        scope = budget.scope(scope)
+        interval = budget.interval
+    if scope is None:
+        sim = simulate([genome for genome_id, genome in genomes], config, seed, course, timer, live, log, budget)
+        assign(genomes, episode_results(sim, course), config, interval)
+        return
+    keys = [(fitness_cache.structure_key(genome), scope) for genome_id, genome in genomes]
+    results = [cache.get(key) for key in keys]
+    todo = [i for i, result in enumerate(results) if result is None]
+    if todo:
+        sim = simulate([genomes[i][1] for i in todo], config, seed, course, timer, live, log, budget)
+        for i, result in zip(todo, episode_results(sim, course)):
+            results[i] = result
+            cache.put(keys[i], result)
+    assign(genomes, results, config, interval)
+
+
+def run(config_file, generations=50, workers=1, course=None, timer=instrumentation.NO_TIMER, live=False,
+        cache=None, log=None, checkpointer=None, resume=None, stats=None, budget=None):
+    """
+    Trains for ``generations`` more generations, starting from the checkpoint at ``resume`` if given and
+    saving through ``checkpointer``, a ``checkpoint.Checkpointer``. A resumed run keeps its tick cap, and its
+    saved course unless ``course`` is given. Per-generation statistics go to ``stats``, a ``stats_log.StatsLog``, along
+    with what ``budget``, a ``tick_budget.TickBudget``, reports.
+    """
+    import neat
+
+    import checkpoint
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_file)
+    p, saved = checkpoint.population(config, resume)
+    if saved is not None:
+        if course is None:
+            course = courses.from_state(saved['course'])
+        if budget is not None and saved['tick_cap'] is not None:
+            budget.cap = saved['tick_cap']
+    if workers > 1 and course is None:
+        # Workers all play one course file, so the course is drawn here, where the checkpoints can save it.
+        course = courses.Course.generate(random.randrange(2 ** 32))
+    p.add_reporter(neat.StdOutReporter(True))
+    if budget is not None:
+        p.add_reporter(budget)
+    if stats is not None:
+        if budget is not None:
+            stats.include(budget)
+        p.add_reporter(stats)
+    if timer.enabled:
+        # With workers the phases run in other processes, so only evaluation and reproduction are timed.
+        p.add_reporter(timer)
+    if cache is not None:
+        p.add_reporter(cache)
+    if log is not None:
+        p.add_reporter(log)
+    if checkpointer is not None:
+        checkpointer.watch(p, course=course, budget=budget)
+        p.add_reporter(checkpointer)
+    if workers > 1:
+        from parallel import ParallelEvaluator
+        evaluator = ParallelEvaluator(workers, course=course, cache=cache, budget=budget, timer=timer)
+        winner = p.run(evaluator.evaluate, generations)
+    else:
+        view = None
+        if live:
+            from snapshots import LiveView
+            view = LiveView(config.pop_size)
+        try:
+            winner = p.run(lambda genomes, config: eval_genomes(genomes, config, course=course, timer=timer,
+                                                                live=view, cache=cache, log=log, budget=budget),
+                           generations)
+        finally:
+            if view is not None:
+                view.close()
+    print('\nBest genome:\n{!s}'.format(winner))
+    save_best(winner, config, 1 if budget is None else budget.interval)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import checkpoint
+    import replay
+    import snapshots
+    import stats_log
+    import tick_budget
+
+    parser = argparse.ArgumentParser(description="Train headlessly with the vectorized engine.")
+    parser.add_argument('--generations', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1, help="processes to split each generation across")
+    courses.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    snapshots.add_arguments(parser)
+    fitness_cache.add_arguments(parser)
+    replay.add_arguments(parser)
+    checkpoint.add_arguments(parser)
+    stats_log.add_arguments(parser)
+    tick_budget.add_arguments(parser)
+    args = parser.parse_args()
+    if args.live and args.workers > 1:
+        parser.error("--live needs the simulation in this process, so it cannot be combined with --workers")
+    if args.replay_log and args.workers > 1:
+        parser.error("--replay-log needs the simulation in this process, so it cannot be combined with --workers")
+
+    local_dir = os.path.dirname(__file__)
+    config_path = os.path.join(local_dir, 'config-feedforward.txt')
+
+    log = replay.from_args(args)
+    checkpointer = checkpoint.from_args(args)
+    stats = stats_log.from_args(args)
+    try:
+        run(config_path, args.generations, args.workers, courses.from_args(args), instrumentation.from_args(args),
+            args.live, fitness_cache.from_args(args), log, checkpointer, args.resume, stats,
+            tick_budget.from_args(args))
+    finally:
+        if log is not None:
+            log.close()
+        if checkpointer is not None:
+            checkpointer.close()
+        if stats is not None:
+            stats.close()
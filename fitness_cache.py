@@ -0,0 +1,88 @@
+"""
+Memoized fitness for genomes that carry over unchanged between generations.
+
+A bird's episode does not depend on the other birds, so on a deterministic course a genome's fitness is a
+function of its network and the course alone. Elites and other unchanged genomes are looked up instead
+of being simulated again.
+"""
+import hashlib
+from collections import OrderedDict
+
+import courses
+from instrumentation import Reporter
+
+DEFAULT_SIZE = 10000
+
+
+def structure_key(genome):
+    """ Digest of what a genome's network is made of: its nodes and biases, and its enabled links and weights. """
+    nodes = sorted((key, node.bias, node.response, node.activation, node.aggregation)
+                   for key, node in genome.nodes.items())
+    links = sorted((link.key, link.weight) for link in genome.connections.values() if link.enabled)
+    return hashlib.blake2b(repr((nodes, links)).encode(), digest_size=16).digest()
+
+
+def course_key(course, seed=None):
+    """ What a cached fitness was played on, or None when pipe heights are drawn fresh every episode. """
+    if course is None:
+        return None if seed is None else ('seed', seed)
+    if isinstance(course, courses.CourseSet):
+        # The reducer is part of what was cached.
+        keys = tuple(course_key(each) for each in course)
+        return None if None in keys else (keys, course.reduce)
+    if course.seed is None:
+        # An unseeded course is only known by identity; the key keeps it alive.
+        return course
+    return ('course', course.seed, len(course))
+
+
+class FitnessCache(Reporter):
+    """
+    Least recently used (fitness, finished) pairs, at most ``size`` of them, where ``finished`` means the
+    bird was still flying when the episode stopped at the score limit. Reports the hit rate every generation.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.lookups = 0
+        self.total_hits = self.total_lookups = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        self.lookups += 1
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def start_generation(self, generation):
+        self.total_hits += self.hits
+        self.total_lookups += self.lookups
+        self.hits = self.lookups = 0
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.lookups:
+            hits = self.total_hits + self.hits
+            lookups = self.total_lookups + self.lookups
+            print('Fitness cache: {0} of {1} genomes reused ({2:.0%}), {3:.0%} overall, {4} entries'.format(
+                self.hits, self.lookups, self.hits / self.lookups, hits / lookups, len(self.entries)))
+
+
+def add_arguments(parser):
+    parser.add_argument('--cache', type=int, default=0, metavar='N',
+                        help="reuse the fitness of up to N unchanged genomes on a fixed course (needs --seed, "
+                             "--course or --courses)")
+
+
+def from_args(args):
+    return FitnessCache(args.cache) if args.cache > 0 else None
@@ -1,224 +1,145 @@
 import cv2
 import numpy as np
-import random
-import os
-import neat
-import pickle
-import time
-from hexss.constants.terminal_color import *
-
-WIN_WIDTH = 600
-WIN_HEIGHT = 800
+
+import game
+from engine import BIRD_HEIGHT, BIRD_WIDTH, BIRD_X, PIPE_WIDTH, WIN_HEIGHT, WIN_WIDTH
+from recorder import VideoRecorder
+
 BG_COLOR = (250, 206, 135)
 PIPE_COLOR = (0, 255, 0)
-BIRD_WIDTH = 30
-BIRD_HEIGHT = 30
-PIPE_WIDTH = 80
-gen = 0
-id_list = []
-
-
-def convert_color(color):
-    return (color[2], color[1], color[0])
-
-
-def rect_collide(r1, r2):
-    return r1[0] < r2[2] and r1[2] > r2[0] and r1[1] < r2[3] and r1[3] > r2[1]
-
-
-class Bird:
-    def __init__(self, color=(255, 0, 0)):
-        self.x = 230
-        self.y = 350
-        self.tick_count = 0
-        self.vel = 0
-        self.height = self.y
-        self.color = convert_color(color)
-
-    def jump(self):
-        self.vel = -10.5
-        self.tick_count = 0
-        self.height = self.y
-
-    def move(self):
-        self.tick_count += 1
-        d = self.vel * self.tick_count + 0.5 * 3 * self.tick_count ** 2
-        if d >= 16:
-            d = 16
-        if d < 0:
-            d -= 2
-        self.y += d
-
-    def draw(self, frame):
-        cv2.rectangle(frame, (int(self.x), int(self.y)), (int(self.x + BIRD_WIDTH), int(self.y + BIRD_HEIGHT)),
-                      self.color, -1)
-
-    def get_rect(self):
-        return (self.x, self.y, self.x + BIRD_WIDTH, self.y + BIRD_HEIGHT)
-
-
-class Pipe:
-    GAP = 200
-    VEL = 10
-
-    def __init__(self, x):
-        self.x = x
-        self.height = random.randrange(50, 450)
-        self.passed = False
-
-    def move(self):
-        self.x -= self.VEL
-
-    def draw(self, frame):
-        top_rect = (int(self.x), 0, int(self.x + PIPE_WIDTH), int(self.height))
-        bottom_rect = (int(self.x), int(self.height + self.GAP), int(self.x + PIPE_WIDTH), WIN_HEIGHT)
-        cv2.rectangle(frame, (top_rect[0], top_rect[1]), (top_rect[2], top_rect[3]), PIPE_COLOR, -1)
-        cv2.rectangle(frame, (bottom_rect[0], bottom_rect[1]), (bottom_rect[2], bottom_rect[3]), PIPE_COLOR, -1)
-
-    def collide(self, bird):
-        b = bird.get_rect()
-        top = (self.x, 0, self.x + PIPE_WIDTH, self.height)
-        bottom = (self.x, self.height + self.GAP, self.x + PIPE_WIDTH, WIN_HEIGHT)
-        return rect_collide(b, top) or rect_collide(b, bottom)
-
-
-def draw_window(birds, pipes, score, gen_val):
-    frame = np.full((WIN_HEIGHT, WIN_WIDTH, 3), BG_COLOR, dtype=np.uint8)
-    for pipe in pipes:
-        pipe.draw(frame)
-    for bird in birds:
-        bird.draw(frame)
-    cv2.putText(frame, "Score: " + str(score), (WIN_WIDTH - 200, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    cv2.putText(frame, "Gens: " + str(gen_val), (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    cv2.putText(frame, "Alive: " + str(len(birds)), (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    cv2.imshow("Flappy Bird", frame)
-    if cv2.waitKey(int(1000 / 30)) & 0xFF == ord('q'):
-        exit()
-
-
-def eval_genomes(genomes, config):
-    print('------------ eval_genomes ------------')
-    global gen, id_list
-    gen += 1
-    nets = []
-    birds = []
-    ge = []
-    for genome_id, genome in genomes:
-        genome.fitness = 0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        nets.append(net)
-        cnt = id_list.count(genome_id)
-        if cnt == 0:
-            birds.append(Bird())
-        elif cnt == 1:
-            birds.append(Bird((0, 0, 255)))
-        elif cnt == 2:
-            birds.append(Bird((0, 50, 255)))
-        elif cnt == 3:
-            birds.append(Bird((0, 100, 255)))
-        elif cnt == 4:
-            birds.append(Bird((0, 150, 255)))
-        elif cnt == 5:
-            birds.append(Bird((0, 200, 255)))
-        else:
-            birds.append(Bird((0, 255, 255)))
-        id_list.append(genome_id)
-        ge.append(genome)
-    pipes = [Pipe(700)]
-    score = 0
-    play = True
-    while play and len(birds) > 0:
-        pipe_ind = 0
-        if len(birds) > 0 and len(pipes) > 1 and birds[0].x > pipes[0].x + PIPE_WIDTH:
-            pipe_ind = 1
-        for i, bird in enumerate(birds):
-            ge[i].fitness += 0.1
-            bird.move()
-            output = nets[birds.index(bird)].activate((
-                bird.y, pipes[pipe_ind].height, pipes[pipe_ind].height + Pipe.GAP
-            ))
-            if output[0] > 0.5:
-                bird.jump()
-        rem = []
-        add_pipe = False
-        for pipe in pipes:
-            pipe.move()
-            for bird in birds:
-                if pipe.collide(bird):
-                    ge[birds.index(bird)].fitness -= 1
-                    nets.pop(birds.index(bird))
-                    ge.pop(birds.index(bird))
-                    birds.pop(birds.index(bird))
-            if pipe.x + PIPE_WIDTH < 0:
-                rem.append(pipe)
-            if birds and not pipe.passed and pipe.x < birds[0].x:
-                pipe.passed = True
-                add_pipe = True
-        if add_pipe:
-            score += 1
-            for genome in ge:
-                genome.fitness += 5
-            pipes.append(Pipe(WIN_WIDTH))
-        for r in rem:
-            pipes.remove(r)
-        for bird in birds:
-            if bird.y < 0 or WIN_HEIGHT < bird.y + BIRD_HEIGHT:
-                nets.pop(birds.index(bird))
-                ge.pop(birds.index(bird))
-                birds.pop(birds.index(bird))
-        draw_window(birds, pipes, score, gen)
-        if score > 20:
-            pickle.dump(nets[0], open("best.pickle", "wb"))
-            print(f'{GREEN}save best.pickle{END}')
-            break
-
-
-def run(config_file):
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
-                                neat.DefaultStagnation, config_file)
-    p = neat.Population(config)
-    p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
-    winner = p.run(eval_genomes, 50)
-    print('\nBest genome:\n{!s}'.format(winner))
-
-
-def run_best():
-    with open("best.pickle", "rb") as f:
-        net = pickle.load(f)
-    bird = Bird()
-    pipes = [Pipe(700)]
-    score = 0
-    play = True
-    while play:
-        pipe_ind = 0
-        if len(pipes) > 1 and bird.x > pipes[0].x + PIPE_WIDTH:
-            pipe_ind = 1
-        bird.move()
-        output = net.activate((bird.y, pipes[pipe_ind].height, pipes[pipe_ind].height + Pipe.GAP))
-        if output[0] > 0.5:
-            bird.jump()
+BACKGROUND = np.full((WIN_HEIGHT, WIN_WIDTH, 3), BG_COLOR, dtype=np.uint8)
+
+
+def fill(frame, x0, y0, x1, y1, color):
+    """ Same pixels as a filled ``cv2.rectangle`` with corners (x0, y0) and (x1, y1); returns the region drawn. """
+    region = (slice(max(y0, 0), max(y1 + 1, 0)), slice(max(x0, 0), max(x1 + 1, 0)))
+    frame[region] = color
+    return region
+
+
+def draw_birds(frame, y, colors):
+    """
+    Draws every bird with a few array operations instead of one rectangle each. Later birds cover earlier
+    ones, as with one ``cv2.rectangle`` per bird. Returns the regions drawn.
+    """
+    if not len(y):
+        return []
+    # Birds carry RGB colours; the frame is BGR.
+    colors = colors[:, ::-1]
+    tops = np.trunc(y).astype(np.int64)
+    bottoms = np.trunc(y + BIRD_HEIGHT).astype(np.int64)
+    rows = tops[:, None] + np.arange(BIRD_HEIGHT + 1)
+    covered = (rows <= bottoms[:, None]) & (rows >= 0) & (rows < WIN_HEIGHT)
+    # Last bird covering each row, so drawing order is kept.
+    owner = np.full(WIN_HEIGHT, -1, dtype=np.int64)
+    np.maximum.at(owner, rows[covered], np.broadcast_to(np.arange(len(y))[:, None], rows.shape)[covered])
+    drawn = np.flatnonzero(owner >= 0)
+    if not len(drawn):
+        return []
+    region = (slice(int(drawn[0]), int(drawn[-1]) + 1), slice(BIRD_X, BIRD_X + BIRD_WIDTH + 1))
+    owner = owner[region[0]]
+    painted = owner >= 0
+    frame[region][painted] = colors[owner[painted]][:, None]
+    return [region]
+
+
+_text_cache = {}
+
+
+def draw_text(frame, text, org, scale=1, thickness=2):
+    """
+    ``cv2.putText`` of white Hershey text. The antialiased coverage of each string is rendered once
+    and then blended in, so the pixels are within one intensity level of putText's.
+    """
+    key = (text, scale, thickness)
+    cached = _text_cache.get(key)
+    if cached is None:
+        (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        pad = thickness + 2
+        coverage = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(coverage, text, (pad, height + pad), cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness)
+        if len(_text_cache) > 1024:
+            _text_cache.clear()
+        cached = _text_cache[key] = (coverage.astype(np.uint16)[:, :, None], pad, height + pad)
+    coverage, dx, dy = cached
+    x0, y0 = org[0] - dx, org[1] - dy
+    x1, y1 = min(x0 + coverage.shape[1], WIN_WIDTH), min(y0 + coverage.shape[0], WIN_HEIGHT)
+    region = (slice(max(y0, 0), max(y1, 0)), slice(max(x0, 0), max(x1, 0)))
+    coverage = coverage[region[0].start - y0:y1 - y0, region[1].start - x0:x1 - x0]
+    under = frame[region].astype(np.uint16)
+    frame[region] = under + ((255 - under) * coverage + 127) // 255
+    return region
+
+
+def draw_pipe(frame, pipe):
+    x0, x1 = int(pipe.x), int(pipe.x + PIPE_WIDTH)
+    return [fill(frame, x0, 0, x1, int(pipe.height), PIPE_COLOR),
+            fill(frame, x0, int(pipe.bottom), x1, WIN_HEIGHT, PIPE_COLOR)]
+
+
+class OpenCVRenderer(game.NullRenderer):
+    """
+    Draws into one reused frame buffer and shows it with ``cv2.imshow``, or with ``window=False`` only
+    streams it to ``recorder``, an optional VideoRecorder. Pressing q closes the window.
+    """
+    renders = True
+
+    def __init__(self, recorder=None, window=True):
+        self.recorder = recorder
+        self.window = window
+        self.frame = None
+        # Regions drawn into the frame last time, which the next render restores.
+        self.dirty = []
+
+    def render(self, y, pipes, score, gen, alive=None, colors=None):
+        """
+        Draws into the shared frame buffer, which is only valid until the next call. Only the regions
+        drawn last time are reset to the background, instead of allocating and clearing a whole frame.
+        """
+        frame = self.frame
+        if frame is None:
+            frame = self.frame = BACKGROUND.copy()
+        dirty = self.dirty
+        for region in dirty:
+            frame[region] = BACKGROUND[region]
+        dirty.clear()
         for pipe in pipes:
-            pipe.move()
-            if pipe.collide(bird):
-                play = False
-                print('pipe.collide(bird)')
-            if pipe.x + PIPE_WIDTH < 0:
-                pipes.remove(pipe)
-            if not pipe.passed and pipe.x < bird.x:
-                pipe.passed = True
-                score += 1
-                pipes.append(Pipe(WIN_WIDTH))
-        if bird.y < 0 or WIN_HEIGHT < bird.y + BIRD_HEIGHT:
-            play = False
-            print('out')
-        draw_window([bird], pipes, score, -1)
-    cv2.destroyAllWindows()
+            dirty.extend(draw_pipe(frame, pipe))
+        dirty.extend(draw_birds(frame, y, game.bird_colors(colors, len(y))))
+        dirty.append(draw_text(frame, "Score: " + str(score), (WIN_WIDTH - 200, 50)))
+        dirty.append(draw_text(frame, "Gens: " + str(gen), (10, 50)))
+        dirty.append(draw_text(frame, "Alive: " + str(len(y) if alive is None else alive), (10, 100)))
+        return frame
+
+    def draw(self, y, pipes, score, gen, alive=None, colors=None, fps=30):
+        frame = self.render(y, pipes, score, gen, alive, colors)
+        if self.recorder is not None:
+            self.recorder.write(frame)
+        if self.window:
+            cv2.imshow("Flappy Bird", frame)
+            if cv2.waitKey(int(1000 / fps)) & 0xFF == ord('q'):
+                return False
+        return True
+
+    def close(self):
+        if self.window:
+            cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    local_dir = os.path.dirname(__file__)
-    config_path = os.path.join(local_dir, "config-feedforward.txt")
-    # run(config_path)
-    run_best()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Watch the AI play flappy bird with OpenCV.")
+    game.add_play_arguments(parser)
+    parser.add_argument('--record', metavar='PATH', help="also write every shown frame to a video file")
+    args = parser.parse_args()
+    recorder = None
+    if args.record:
+        recorder = VideoRecorder(args.record, (WIN_WIDTH, WIN_HEIGHT), args.fps)
+
+    try:
+        # Only the champion is played here, so only its options are offered; flappy_bird.py trains.
+        game.main(args, OpenCVRenderer(recorder), train=False)
+    finally:
+        if recorder is not None:
+            recorder.close()
@@ -0,0 +1,279 @@
+"""
+What every frontend shares: drawn training generations, run_best and the state they keep.
+
+A frontend only supplies a renderer. ``NullRenderer`` below is both the interface and the headless
+backend; flappy_bird.py and flappy_bird_cv.py implement it with pygame and OpenCV. Every episode is
+played by the engine's ``Simulation``; a drawn one hands each tick's flock and pipes to the renderer.
+"""
+import math
+import os
+
+import numpy as np
+
+import champion
+import checkpoint
+import courses
+import decision_table
+import engine
+import fitness_cache
+import instrumentation
+import render_policy
+import replay
+import snapshots
+import stats_log
+import tick_budget
+from lineage import LineageTracker
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config-feedforward.txt')
+# Colour of birds drawn without a lineage colour, as RGB.
+BIRD_COLOR = (255, 0, 0)
+
+
+def bird_colors(colors, count):
+    """ One RGB row per bird: ``colors``, or ``BIRD_COLOR`` for all ``count`` birds when it is None. """
+    if colors is None:
+        return np.broadcast_to(np.array(BIRD_COLOR, dtype=np.uint8), (count, 3))
+    return np.asarray(colors, dtype=np.uint8)
+
+
+class NullRenderer(object):
+    """
+    Draws nothing and costs nothing. Renderers set ``renders`` when they show something.
+    A frame is the ``y`` of every bird to draw, at ``engine.BIRD_X``, with one RGB row of ``colors`` per bird
+    or ``BIRD_COLOR`` for all, and pipes with ``x``, ``height`` and ``bottom`` such as ``engine.Pipe``.
+    ``draw`` shows a frame paced at ``fps`` and returns False once the user has closed the window.
+    """
+    renders = False
+
+    def open(self):
+        pass
+
+    def render(self, y, pipes, score, gen, alive=None, colors=None):
+        pass
+
+    def draw(self, y, pipes, score, gen, alive=None, colors=None, fps=30):
+        return True
+
+    def close(self):
+        pass
+
+
+class Screen(object):
+    """
+    The ``live`` hook that draws a Simulation on the renderer, on the ticks and at the frame rate of ``pace``,
+    a ``render_policy.RenderPolicy``: the birds still flying in their ``colors``, or only the bird at ``focus``
+    while it flies. With ``view``, a ``snapshots.LiveView``, every tick is published there instead.
+    ``publish`` returns False, which ends the episode, once the window is closed.
+    """
+
+    def __init__(self, gen, pace, colors=None, focus=None, view=None):
+        self.gen = gen
+        self.pace = pace
+        self.colors = colors
+        self.focus = focus
+        self.view = view
+        self.tick = 0
+
+    def new_episode(self):
+        self.tick = 0
+        if self.view is not None:
+            self.view.new_episode()
+
+    def publish(self, score, y, alive, pipes):
+        if self.view is not None:
+            self.view.publish(score, y, alive, pipes)
+            return self.view.watching
+        tick = self.tick
+        self.tick += 1
+        if not self.pace.renders_tick(tick):
+            return True
+        t = timer.clock()
+        shown = np.flatnonzero(alive)
+        flying = len(shown)
+        if self.focus is not None:
+            shown = shown[:1] if not alive[self.focus] else np.array([self.focus])
+        colors = None if self.colors is None else self.colors[shown]
+        opened = renderer.draw(y[shown], pipes, score, self.gen, flying, colors, self.pace.fps)
+        timer.lap('draw', t)
+        return opened
+
+
+renderer = NullRenderer()
+gen = 0
+policy = render_policy.RenderPolicy()
+lineage = LineageTracker()
+# Pipe course shared by training and run_best; None draws fresh heights from random.
+course = None
+best_id = None
+# Per-phase timing; replaced by run() when profiling is on.
+timer = instrumentation.NO_TIMER
+# snapshots.LiveView that headless generations and run_best publish to instead of drawing.
+live_view = None
+# fitness_cache.FitnessCache consulted by the generations that are not drawn.
+cache = None
+# replay.ReplayLog that every episode, drawn or not, is written to.
+replay_log = None
+# decision_table.DecisionTable that run_best decides from instead of the champion network.
+lookup_table = None
+# tick_budget.TickBudget with the decision interval and tick cap of every episode; None decides every tick.
+budget = None
+
+
+def eval_genomes(genomes, config):
+    print('------------ eval_genomes ------------')
+    global gen, best_id
+    gen += 1
+    lineage.observe(genome_id for genome_id, genome in genomes)
+    # A CourseSet is played as one batched simulation of every course at once, which is not drawn.
+    if not (renderer.renders and policy.renders_generation(gen)) or isinstance(course, courses.CourseSet):
+        engine.eval_genomes(genomes, config, course=course, timer=timer, live=live_view, cache=cache, log=replay_log,
+                            budget=budget)
+    else:
+        renderer.open()
+        colors = np.array([lineage.color(genome_id) for genome_id, genome in genomes], dtype=np.uint8)
+        focus = None
+        if policy.best_only:
+            focus = next((i for i, (genome_id, genome) in enumerate(genomes) if genome_id == best_id), 0)
+        screen = Screen(gen, policy, colors, focus)
+        # Every genome is played while it is watched, so none is taken from the fitness cache.
+        engine.eval_genomes(genomes, config, course=course, timer=timer, live=screen, log=replay_log, budget=budget)
+    best_id = max(genomes, key=lambda item: item[1].fitness)[0]
+
+
+def run(config_file, render=None, profile=None, live=False, memo=None, log=None, generations=50, checkpointer=None,
+        resume=None, stats=None):
+    """
+    Trains for ``generations`` more generations, starting from the checkpoint at ``resume`` if given and
+    saving through ``checkpointer``. A resumed run keeps its lineage and tick cap, and its course unless one was
+    set.
+    Per-generation statistics go to ``stats``, a ``stats_log.StatsLog``.
+    """
+    import neat
+
+    global policy, timer, live_view, cache, replay_log, course
+    if render is not None:
+        policy = render
+    if profile is not None:
+        timer = profile
+    if memo is not None:
+        cache = memo
+    if log is not None:
+        replay_log = log
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_file)
+    if live:
+        # Every generation runs headless at full speed; the display process shows the newest tick.
+        policy.headless = True
+        live_view = snapshots.LiveView(config.pop_size, policy.fps)
+    p, saved = checkpoint.population(config, resume)
+    if saved is not None:
+        if course is None:
+            course = courses.from_state(saved['course'])
+        if saved['lineage'] is not None:
+            lineage.streaks = saved['lineage']
+        if budget is not None and saved['tick_cap'] is not None:
+            budget.cap = saved['tick_cap']
+    p.add_reporter(neat.StdOutReporter(True))
+    if budget is not None:
+        p.add_reporter(budget)
+    if stats is not None:
+        if budget is not None:
+            stats.include(budget)
+        p.add_reporter(stats)
+    p.add_reporter(lineage)
+    if timer.enabled:
+        p.add_reporter(timer)
+    if cache is not None:
+        p.add_reporter(cache)
+    if replay_log is not None:
+        p.add_reporter(replay_log)
+    if checkpointer is not None:
+        checkpointer.watch(p, lineage, course, budget)
+        p.add_reporter(checkpointer)
+    winner = p.run(eval_genomes, generations)
+    print('\nBest genome:\n{!s}'.format(winner))
+    engine.save_best(winner, config, 1 if budget is None else budget.interval)
+
+
+def run_best(fps=30, interval=None):
+    """ Plays the champion, deciding every ``interval`` ticks or, by default, as often as it was trained to. """
+    net = champion.load() if lookup_table is None else lookup_table
+    if live_view is None:
+        renderer.open()
+    record = None if replay_log is None else replay_log.episode([0], generation=-1)
+    # It plays on past any tick cap and score limit.
+    if interval is None:
+        interval = net.interval
+    # A single bird gets fresh heights instead of one course of a CourseSet.
+    screen = Screen(-1, render_policy.RenderPolicy(fps=fps), view=live_view)
+    sim = engine.Simulation(1, course=None if isinstance(course, courses.CourseSet) else course, live=screen,
+                            record=record, interval=interval)
+    sim.run(engine.net_policy([net]), max_score=math.inf)
+    renderer.close()
+
+
+def add_arguments(parser):
+    parser.add_argument('--generations', type=int, default=50, help="generations to train, counted from --resume")
+    render_policy.add_arguments(parser)
+    courses.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    snapshots.add_arguments(parser)
+    fitness_cache.add_arguments(parser)
+    replay.add_arguments(parser)
+    decision_table.add_arguments(parser)
+    checkpoint.add_arguments(parser)
+    stats_log.add_arguments(parser)
+    tick_budget.add_arguments(parser)
+
+
+def add_play_arguments(parser):
+    """ The options of ``main`` with ``train`` False, which only plays the champion. """
+    parser.add_argument('--fps', type=int, default=30, help="frame rate of the champion's run")
+    courses.add_arguments(parser, sets=False)
+    snapshots.add_arguments(parser)
+    replay.add_arguments(parser)
+    decision_table.add_arguments(parser)
+    tick_budget.add_arguments(parser, cap=False)
+
+
+def main(args, backend, train=True):
+    """
+    What every frontend runs: trains on ``backend`` unless ``train`` is False, then plays the champion
+    when there is something to watch it on. Without ``train``, ``args`` need only the ``add_play_arguments``.
+    """
+    global renderer, course, lookup_table, replay_log, live_view, budget
+    renderer = backend
+    budget = tick_budget.from_args(args)
+    course = courses.from_args(args)
+    lookup_table = decision_table.from_args(args)
+    replay_log = replay.from_args(args)
+    checkpointer = checkpoint.from_args(args) if train else None
+    stats = stats_log.from_args(args) if train else None
+    try:
+        if train:
+            run(CONFIG_PATH, render_policy.from_args(args), instrumentation.from_args(args), args.live,
+                fitness_cache.from_args(args), generations=args.generations, checkpointer=checkpointer,
+                resume=args.resume, stats=stats)
+        elif args.live:
+            live_view = snapshots.LiveView(1, args.fps)
+        if not train or args.live or (renderer.renders and not args.headless):
+            run_best(args.fps, args.decision_interval)
+    finally:
+        if live_view is not None:
+            live_view.close()
+        if replay_log is not None:
+            replay_log.close()
+        if checkpointer is not None:
+            checkpointer.close()
+        if stats is not None:
+            stats.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train with the null renderer: nothing is drawn or imported "
+                                                 "for drawing, and every generation runs in the engine.")
+    add_arguments(parser)
+    main(parser.parse_args(), NullRenderer())
@@ -0,0 +1,149 @@
+"""
+Per-phase timing of the training loops.
+
+``Reporter`` is neat's reporter interface without importing neat, so *engine.py* can use its reporters
+and still load without neat. Add a ``PhaseTimer`` with ``Population.add_reporter`` and it prints or appends
+one record per generation: evaluation time split by phase, reproduction time, ticks and deaths.
+"""
+import json
+from time import perf_counter
+
+PHASES = ('create', 'activate', 'physics', 'collide', 'pipes', 'draw')
+
+
+def _clock():
+    return 0.0
+
+
+def _lap(phase, start):
+    return 0.0
+
+
+def _count(ticks, deaths):
+    pass
+
+
+class Reporter(object):
+    """ Same hooks as ``neat.reporting.BaseReporter``, all doing nothing. """
+
+    def start_generation(self, generation):
+        pass
+
+    def end_generation(self, config, population, species_set):
+        pass
+
+    def post_evaluate(self, config, population, species, best_genome):
+        pass
+
+    def post_reproduction(self, config, population, species):
+        pass
+
+    def complete_extinction(self):
+        pass
+
+    def found_solution(self, config, generation, best):
+        pass
+
+    def species_stagnant(self, sid, species):
+        pass
+
+    def info(self, msg):
+        pass
+
+
+class PhaseTimer(Reporter):
+    """
+    The loops call ``t = timer.clock()`` and then ``t = timer.lap(phase, t)`` after each phase, so every
+    interval is charged to the phase that just ran. A disabled timer swaps in module-level no-ops,
+    which leaves one cheap call per phase per tick.
+    """
+
+    def __init__(self, enabled=True, path=None):
+        self.enabled = enabled
+        self.path = path
+        self.generation = None
+        self.started = self.evaluated = None
+        self.population_size = 0
+        self.reset()
+        if not enabled:
+            self.clock = _clock
+            self.lap = _lap
+            self.count = _count
+
+    def reset(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.ticks = 0
+        self.deaths = 0
+
+    def clock(self):
+        return perf_counter()
+
+    def lap(self, phase, start):
+        now = perf_counter()
+        self.seconds[phase] += now - start
+        return now
+
+    def count(self, ticks, deaths):
+        self.ticks += ticks
+        self.deaths += deaths
+
+    def record(self, population_size, reproduce=None):
+        evaluate = self.evaluated - self.started
+        record = {
+            'generation': self.generation,
+            'genomes': population_size,
+            'evaluate_s': evaluate,
+            'reproduce_s': reproduce,
+            'untimed_s': evaluate - sum(self.seconds.values()),
+            'ticks': self.ticks,
+            'deaths': self.deaths,
+        }
+        record.update((phase + '_s', seconds) for phase, seconds in self.seconds.items())
+        return record
+
+    def emit(self, record):
+        if self.path is None:
+            evaluate = record['evaluate_s'] or 1.0
+            phases = ', '.join('{0} {1:.0%}'.format(phase, record[phase + '_s'] / evaluate)
+                               for phase in PHASES if record[phase + '_s'])
+            reproduce = record['reproduce_s']
+            print('Phases: evaluate {0:.3f} sec ({1}), reproduce {2}, {3} ticks, {4} deaths'.format(
+                record['evaluate_s'], phases or 'untimed',
+                'n/a' if reproduce is None else '{0:.3f} sec'.format(reproduce), record['ticks'], record['deaths']))
+        else:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.reset()
+        self.started = perf_counter()
+
+    def end_generation(self, config, population, species_set):
+        if self.evaluated is not None:
+            self.emit(self.record(self.population_size, perf_counter() - self.evaluated))
+            self.evaluated = None
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluated = perf_counter()
+        self.population_size = len(population)
+
+    def found_solution(self, config, generation, best):
+        # The run stops before end_generation, so the last generation has no reproduction time.
+        if self.evaluated is not None:
+            self.emit(self.record(self.population_size))
+            self.evaluated = None
+
+
+NO_TIMER = PhaseTimer(enabled=False)
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='-', metavar='PATH',
+                        help="report time per phase each generation, to stdout or appended to PATH as JSON lines")
+
+
+def from_args(args):
+    if args.profile is None:
+        return NO_TIMER
+    return PhaseTimer(path=None if args.profile == '-' else args.profile)
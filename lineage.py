@@ -0,0 +1,43 @@
+from instrumentation import Reporter
+
+# Bird colour by the number of earlier generations its genome survived; the last entry covers any longer streak.
+STREAK_COLORS = [
+    (255, 0, 0),
+    (0, 0, 255),
+    (0, 50, 255),
+    (0, 100, 255),
+    (0, 150, 255),
+    (0, 200, 255),
+    (0, 255, 255),
+]
+
+
+class LineageTracker(Reporter):
+    """
+    Counts how many earlier generations each live genome has been evaluated in.
+
+    Only genomes of the latest observed generation are kept, since a genome missing from a
+    generation is extinct, so memory is proportional to the population and lookups are O(1).
+    """
+
+    def __init__(self):
+        self.streaks = {}
+
+    def observe(self, genome_ids):
+        previous = self.streaks
+        self.streaks = {genome_id: previous[genome_id] + 1 if genome_id in previous else 0
+                        for genome_id in genome_ids}
+
+    def streak(self, genome_id):
+        return self.streaks.get(genome_id, 0)
+
+    def color(self, genome_id):
+        return STREAK_COLORS[min(self.streak(genome_id), len(STREAK_COLORS) - 1)]
+
+    def longest(self):
+        return max(self.streaks.values(), default=0)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.streaks:
+            print('Best genome survived {0} earlier generations; longest streak {1}'.format(
+                self.streak(best_genome.key), self.longest()))
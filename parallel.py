@@ -0,0 +1,102 @@
+"""
+Splits each generation across a process pool.
+
+Every worker attaches to the same course file, so a genome scores the same whichever worker gets it,
+the course is never pickled, and a run can be repeated exactly.
+"""
+import os
+import random
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+
+import courses
+import engine
+import fitness_cache
+import instrumentation
+import tick_budget
+
+
+def eval_chunk(genomes, config, course_paths, reduce='mean', interval=1, max_ticks=None):
+    """
+    Runs in a worker: returns the chunk's (fitness, finished) pairs, as ``engine.episode_results``, and the
+    (ticks, deaths, activations, capped) of its simulation.
+    """
+    if len(course_paths) == 1:
+        course = courses.attach(course_paths[0])
+    else:
+        course = courses.CourseSet([courses.attach(path) for path in course_paths], reduce)
+    sim = engine.simulate(genomes, config, course=course, budget=tick_budget.TickBudget(interval, max_ticks))
+    deaths = len(sim.flock) - int(np.count_nonzero(sim.flock.alive))
+    return engine.episode_results(sim, course), (sim.ticks, deaths, sim.activations, sim.capped)
+
+
+class ParallelEvaluator(object):
+    def __init__(self, num_workers, seed=None, timeout=None, course=None, cache=None, budget=None,
+                 timer=instrumentation.NO_TIMER):
+        """
+        Plays ``course`` (a Course or CourseSet), or one generated from ``seed``, for the whole run. When both
+        are None the seed is drawn from the global ``random`` state, so a seeded NEAT run stays reproducible.
+        Genomes found in ``cache``, a ``fitness_cache.FitnessCache``, are not sent to the workers. Every
+        chunk is played with the decision interval and current tick cap of ``budget``, a ``tick_budget.TickBudget``.
+        The ticks and deaths of each generation are counted on ``timer``, as the longest chunk and the sum.
+        """
+        if course is None:
+            course = courses.Course.generate(random.randrange(2 ** 32) if seed is None else seed)
+        self.course = course
+        self.reduce = getattr(course, 'reduce', 'mean')
+        self.tmpdir = None
+        self.course_paths = []
+        for k, each in enumerate(course if isinstance(course, courses.CourseSet) else [course]):
+            if isinstance(each.pipes, np.memmap):
+                self.course_paths.append(each.pipes.filename)
+                continue
+            if self.tmpdir is None:
+                self.tmpdir = tempfile.TemporaryDirectory(prefix='flappy-course-')
+            path = os.path.join(self.tmpdir.name, 'course{0}'.format(k))
+            each.save(path)
+            self.course_paths.append(path)
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.budget = budget
+        self.timer = timer
+        self.scope = fitness_cache.course_key(course)
+        self.pool = Pool(num_workers)
+
+    def __del__(self):
+        self.pool.close()
+        self.pool.join()
+        if self.tmpdir is not None:
+            self.tmpdir.cleanup()
+
+    def evaluate(self, genomes, config):
+        results = [None] * len(genomes)
+        keys = None
+        budget = self.budget
+        if self.cache is not None:
+            scope = self.scope if budget is None else budget.scope(self.scope)
+            keys = [(fitness_cache.structure_key(genome), scope) for genome_id, genome in genomes]
+            results = [self.cache.get(key) for key in keys]
+        todo = [i for i, result in enumerate(results) if result is None]
+
+        bounds = np.linspace(0, len(todo), self.num_workers + 1).astype(int)
+        chunks = [todo[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        interval, max_ticks = (1, None) if budget is None else (budget.interval, budget.cap)
+        jobs = [self.pool.apply_async(eval_chunk, ([genomes[i][1] for i in chunk], config, self.course_paths,
+                                                   self.reduce, interval, max_ticks))
+                for chunk in chunks]
+        most_ticks = all_deaths = 0
+        for chunk, job in zip(chunks, jobs):
+            chunk_results, (ticks, deaths, activations, capped) = job.get(timeout=self.timeout)
+            most_ticks = max(most_ticks, ticks)
+            all_deaths += deaths
+            if budget is not None:
+                budget.observe(ticks, activations, capped)
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+                if keys is not None:
+                    self.cache.put(keys[i], result)
+        self.timer.count(most_ticks, all_deaths)
+        engine.assign(genomes, results, config, interval)
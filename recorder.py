@@ -0,0 +1,62 @@
+"""
+Streams rendered frames to a video file from a background thread.
+
+Frames are copied into a fixed pool of preallocated buffers and handed to the writer thread through a
+bounded queue, so recording allocates nothing per frame and encoding never blocks the game loop.
+"""
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+
+class VideoRecorder(object):
+    """
+    ``write`` copies the frame and returns at once. When the writer falls ``buffers`` frames behind,
+    the frame is dropped and counted, or with ``drop=False`` the caller waits for a free buffer;
+    ``close`` reports the count.
+    """
+
+    def __init__(self, path, size, fps=30, buffers=64, fourcc='mp4v', drop=True):
+        width, height = size
+        self.path = path
+        self.drop = drop
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not self.writer.isOpened():
+            raise IOError("Cannot open video writer for {0!r}".format(path))
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self.pending = queue.Queue(buffers)
+        self.written = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._drain, name='video-writer', daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            frame = self.pending.get()
+            if frame is None:
+                break
+            self.writer.write(frame)
+            self.written += 1
+            self.free.put(frame)
+        self.writer.release()
+
+    def write(self, frame):
+        try:
+            buffer = self.free.get(block=not self.drop)
+        except queue.Empty:
+            self.dropped += 1
+            return
+        np.copyto(buffer, frame)
+        self.pending.put(buffer)
+
+    def close(self):
+        """ Waits for queued frames to be encoded and finishes the file. """
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+            print('Recorded {0} frames to {1}{2}'.format(
+                self.written, self.path, ', dropped {0}'.format(self.dropped) if self.dropped else ''))
@@ -0,0 +1,34 @@
+class RenderPolicy:
+    """
+    Decides which generations and ticks of training get drawn.
+
+    Generations that are not drawn at all are handed to the vectorized engine, so they run as fast as
+    the machine allows; drawn frames are still paced at ``fps``.
+    """
+
+    def __init__(self, headless=False, every_tick=1, every_gen=1, best_only=False, fps=30):
+        self.headless = headless
+        self.every_tick = max(1, every_tick)
+        self.every_gen = max(1, every_gen)
+        self.best_only = best_only
+        self.fps = fps
+
+    def renders_generation(self, gen):
+        return not self.headless and (gen - 1) % self.every_gen == 0
+
+    def renders_tick(self, tick):
+        return tick % self.every_tick == 0
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("rendering")
+    group.add_argument('--headless', action='store_true', help="never draw; train at full speed")
+    group.add_argument('--every-tick', type=int, default=1, metavar='N', help="draw every Nth tick")
+    group.add_argument('--every-gen', type=int, default=1, metavar='K', help="draw every Kth generation")
+    group.add_argument('--best-only', action='store_true',
+                       help="draw only the bird of the previous generation's best genome")
+    group.add_argument('--fps', type=int, default=30, help="frame rate of drawn ticks")
+
+
+def from_args(args):
+    return RenderPolicy(args.headless, args.every_tick, args.every_gen, args.best_only, args.fps)
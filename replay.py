@@ -0,0 +1,330 @@
+"""
+Compact binary logs of whole episodes, and a replayer that needs neither networks nor neat.
+
+A bird's path is fixed by the ticks on which it jumped, so an episode is stored as one bit per bird per
+tick, packed and compressed, with each bird's death tick and the pipes that spawned. The replayer steps
+``engine.Flock`` through those bits to rebuild any tick of any generation or bird.
+
+A log is a header, one record per episode and, once the log is closed, an index of the records'
+offsets followed by a footer. A log cut short by a crash has no index and is scanned instead.
+"""
+import zlib
+
+import numpy as np
+
+from engine import FIRST_PIPE_X, PIPE_VEL, PIPE_WIDTH, WIN_HEIGHT, WIN_WIDTH, Flock, Pipe
+from instrumentation import Reporter
+
+MAGIC = b'FBREPLAY'
+VERSION = 1
+# Ticks between the flock states an Episode keeps once it has been played through, to seek without replaying.
+KEYFRAME = 256
+
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4')])
+EPISODE_DTYPE = np.dtype([('magic', 'S4'), ('generation', '<i4'), ('birds', '<u4'), ('courses', '<u4'),
+                          ('ticks', '<u4'), ('score', '<u4'), ('pipes', '<u4'), ('jump_bytes', '<u4')])
+INDEX_DTYPE = np.dtype([('generation', '<i4'), ('offset', '<i8'), ('birds', '<u4'), ('ticks', '<u4')])
+FOOTER_DTYPE = np.dtype([('magic', 'S8'), ('count', '<u4'), ('offset', '<i8')])
+EPISODE_MAGIC = b'EPIS'
+INDEX_MAGIC = b'FBINDEX'
+
+
+class EpisodeRecorder(object):
+    """
+    Collects one episode. The simulation calls ``tick(jumped, alive, pipes)`` at the end of every tick,
+    where ``jumped`` and ``alive`` are masks or index arrays over the episode's birds, and ``finish(score)``
+    once. With several courses the birds are laid out course by course and every pipe height has one
+    entry per bird, as in ``courses.CourseSet``.
+    """
+
+    def __init__(self, log, generation, ids, courses=1):
+        self.log = log
+        self.generation = generation
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.courses = courses
+        self.per_course = len(self.ids) // courses
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.deaths = np.zeros(len(self.ids), dtype=np.int32)
+        self.jumps = []
+        self.heights = []
+        self.spawns = []
+        self.last_pipe = None
+
+    def spawn(self, tick, pipe):
+        self.heights.append(np.broadcast_to(pipe.height, (len(self.ids),))[::self.per_course])
+        self.spawns.append(tick)
+        self.last_pipe = pipe
+
+    def tick(self, jumped, alive, pipes):
+        if self.last_pipe is None:
+            # The first pipe was there from the start.
+            self.spawn(0, pipes[0])
+        bits = np.zeros(len(self.ids), dtype=bool)
+        bits[jumped] = True
+        self.jumps.append(np.packbits(bits))
+        now = np.zeros(len(self.ids), dtype=bool)
+        now[alive] = True
+        self.deaths[self.alive & ~now] = len(self.jumps)
+        self.alive = now
+        if pipes[-1] is not self.last_pipe:
+            self.spawn(len(self.jumps), pipes[-1])
+
+    def finish(self, score):
+        self.log.write(self, score)
+
+
+class ReplayLog(Reporter):
+    """
+    Writes episodes to ``path`` as they finish. Added to a population, it numbers episodes by generation;
+    ``close`` writes the index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(np.array([(MAGIC, VERSION)], dtype=HEADER_DTYPE).tobytes())
+        self.generation = 0
+        self.index = []
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def episode(self, ids, courses=1, generation=None):
+        """ An EpisodeRecorder for birds with genome keys ``ids``; run_best passes ``generation=-1``. """
+        return EpisodeRecorder(self, self.generation if generation is None else generation, ids, courses)
+
+    def write(self, episode, score):
+        ticks = len(episode.jumps)
+        jumps = np.array(episode.jumps, dtype=np.uint8).reshape(ticks, (len(episode.ids) + 7) // 8)
+        packed = zlib.compress(jumps.tobytes(), 6)
+        heights = np.array(episode.heights, dtype='<i2').reshape(len(episode.spawns), episode.courses)
+        header = np.array([(EPISODE_MAGIC, episode.generation, len(episode.ids), episode.courses, ticks, score,
+                            len(episode.spawns), len(packed))], dtype=EPISODE_DTYPE)
+        offset = self.file.tell()
+        self.file.write(header.tobytes())
+        self.file.write(episode.ids.astype('<i8').tobytes())
+        self.file.write(episode.deaths.astype('<i4').tobytes())
+        self.file.write(heights.tobytes())
+        self.file.write(np.array(episode.spawns, dtype='<i4').tobytes())
+        self.file.write(packed)
+        self.file.flush()
+        self.index.append((episode.generation, offset, len(episode.ids), ticks))
+
+    def close(self):
+        if self.file.closed:
+            return
+        offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+        self.file.write(np.array([(INDEX_MAGIC, len(self.index), offset)], dtype=FOOTER_DTYPE).tobytes())
+        self.file.close()
+        print('Replay log: {0} episodes, {1} bytes in {2}'.format(len(self.index), offset, self.path))
+
+
+class Frame(object):
+    """ A tick as drawn: ys and genome keys of the birds still flying, pipes as (x, height) and the score. """
+
+    def __init__(self, tick, y, ids, pipes, score):
+        self.tick = tick
+        self.y = y
+        self.ids = ids
+        self.pipes = pipes
+        self.score = score
+
+
+class Episode(object):
+    """ One logged episode. ``frame(tick)`` seeks from the nearest keyframe; ``frames`` plays on from a tick. """
+
+    def __init__(self, generation, ids, courses, ticks, score, deaths, heights, spawns, jumps):
+        self.generation = generation
+        self.ids = ids
+        self.courses = courses
+        self.ticks = ticks
+        self.score = score
+        self.deaths = deaths
+        self.heights = heights
+        self.spawns = spawns
+        self.jumps = jumps
+        self.keyframes = None
+
+    def jumped(self, tick):
+        """ Mask of the birds that jumped on ``tick``, counted from 1. """
+        return np.unpackbits(self.jumps[tick - 1], count=len(self.ids)).astype(bool)
+
+    def alive(self, tick):
+        return (self.deaths == 0) | (self.deaths > tick)
+
+    def step(self, flock, tick):
+        flock.move()
+        flock.jump(self.jumped(tick))
+
+    def flock(self, tick):
+        """ The flock as it was at the end of ``tick``; dead birds keep falling and are not meaningful. """
+        if self.keyframes is None:
+            self.keyframes = []
+            flock = Flock(len(self.ids))
+            for t in range(self.ticks + 1):
+                if t:
+                    self.step(flock, t)
+                if t % KEYFRAME == 0:
+                    self.keyframes.append((flock.y.copy(), flock.vel.copy(), flock.tick_count.copy()))
+        start = min(tick // KEYFRAME, len(self.keyframes) - 1) * KEYFRAME
+        flock = Flock(len(self.ids))
+        flock.y[:], flock.vel[:], flock.tick_count[:] = self.keyframes[start // KEYFRAME]
+        for t in range(start + 1, tick + 1):
+            self.step(flock, t)
+        return flock
+
+    def pipes(self, tick, course=0):
+        spawned = self.spawns <= tick
+        x = np.where(np.arange(len(self.spawns)) == 0, FIRST_PIPE_X, WIN_WIDTH) - PIPE_VEL * (tick - self.spawns)
+        shown = spawned & (x + PIPE_WIDTH >= 0)
+        return list(zip(x[shown].tolist(), self.heights[shown, course].tolist()))
+
+    def make_frame(self, flock, tick, course=0, bird=None):
+        lane = slice(course * (len(self.ids) // self.courses), (course + 1) * (len(self.ids) // self.courses))
+        alive = self.alive(tick)[lane]
+        ids = self.ids[lane]
+        if bird is not None:
+            alive &= ids == bird
+        score = int(np.count_nonzero((self.spawns > 0) & (self.spawns <= tick)))
+        return Frame(tick, flock.y[lane][alive], ids[alive], self.pipes(tick, course), score)
+
+    def frame(self, tick, course=0, bird=None):
+        return self.make_frame(self.flock(tick), tick, course, bird)
+
+    def frames(self, start=0, course=0, bird=None):
+        """ Yields every Frame from ``start`` to the end, stepping the flock once per tick. """
+        flock = self.flock(start)
+        yield self.make_frame(flock, start, course, bird)
+        for tick in range(start + 1, self.ticks + 1):
+            self.step(flock, tick)
+            yield self.make_frame(flock, tick, course, bird)
+
+
+class Replay(object):
+    """ Reads a log written by ReplayLog; ``index`` holds one INDEX_DTYPE entry per episode. """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        header = np.frombuffer(self.data, dtype=HEADER_DTYPE, count=1)
+        if header['magic'][0] != MAGIC:
+            raise ValueError("{0!r} is not a replay log".format(path))
+        if header['version'][0] != VERSION:
+            raise ValueError("Unsupported replay log version {0} in {1!r}".format(header['version'][0], path))
+        self.index = self.read_index()
+
+    def read_index(self):
+        if len(self.data) >= HEADER_DTYPE.itemsize + FOOTER_DTYPE.itemsize:
+            footer = np.frombuffer(self.data, dtype=FOOTER_DTYPE, count=1,
+                                   offset=len(self.data) - FOOTER_DTYPE.itemsize)
+            if footer['magic'][0] == INDEX_MAGIC:
+                return np.frombuffer(self.data, dtype=INDEX_DTYPE, count=int(footer['count'][0]),
+                                     offset=int(footer['offset'][0]))
+        # No index: the writer did not get to close the log, so walk the records up to the last whole one.
+        index = []
+        offset = HEADER_DTYPE.itemsize
+        while offset + EPISODE_DTYPE.itemsize <= len(self.data):
+            header = np.frombuffer(self.data, dtype=EPISODE_DTYPE, count=1, offset=offset)[0]
+            if header['magic'] != EPISODE_MAGIC:
+                break
+            end = offset + self.record_size(header)
+            if end > len(self.data):
+                break
+            index.append((header['generation'], offset, header['birds'], header['ticks']))
+            offset = end
+        return np.array(index, dtype=INDEX_DTYPE)
+
+    @staticmethod
+    def record_size(header):
+        birds, pipes = int(header['birds']), int(header['pipes'])
+        # Keys and death ticks per bird, heights and spawn ticks per pipe, then the compressed jump bits.
+        return (EPISODE_DTYPE.itemsize + 12 * birds + pipes * (2 * int(header['courses']) + 4)
+                + int(header['jump_bytes']))
+
+    def __len__(self):
+        return len(self.index)
+
+    def find(self, generation):
+        """ Position in the index of the first episode of ``generation``. """
+        matches = np.flatnonzero(self.index['generation'] == generation)
+        if len(matches) == 0:
+            raise KeyError("No episode of generation {0} in {1!r}".format(generation, self.path))
+        return int(matches[0])
+
+    def episode(self, i):
+        offset = int(self.index['offset'][i])
+        header = np.frombuffer(self.data, dtype=EPISODE_DTYPE, count=1, offset=offset)[0]
+        birds, courses, pipes = int(header['birds']), int(header['courses']), int(header['pipes'])
+        offset += EPISODE_DTYPE.itemsize
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(self.data, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        ids = take('<i8', birds)
+        deaths = take('<i4', birds)
+        heights = take('<i2', pipes * courses).reshape(pipes, courses)
+        spawns = take('<i4', pipes).astype(np.int64)
+        ticks = int(header['ticks'])
+        raw = zlib.decompress(self.data[offset:offset + int(header['jump_bytes'])])
+        jumps = np.frombuffer(raw, dtype=np.uint8).reshape(ticks, (birds + 7) // 8)
+        return Episode(int(header['generation']), ids, courses, ticks, int(header['score']), deaths, heights,
+                       spawns, jumps)
+
+
+def show(episode, start=0, course=0, bird=None, fps=30, output=None):
+    """ Draws an episode with the OpenCV renderer, in a window or, with ``output``, into a video file. """
+    from flappy_bird_cv import OpenCVRenderer
+
+    recorder = None
+    if output is not None:
+        from recorder import VideoRecorder
+        recorder = VideoRecorder(output, (WIN_WIDTH, WIN_HEIGHT), fps, drop=False)
+    renderer = OpenCVRenderer(recorder, window=recorder is None)
+    try:
+        for frame in episode.frames(start, course, bird):
+            pipes = [Pipe(x, height) for x, height in frame.pipes]
+            if not renderer.draw(frame.y, pipes, frame.score, episode.generation, fps=fps):
+                break
+    finally:
+        renderer.close()
+        if recorder is not None:
+            recorder.close()
+
+
+def add_arguments(parser):
+    parser.add_argument('--replay-log', metavar='PATH',
+                        help="write every episode to a compact replay log (see replay.py)")
+
+
+def from_args(args):
+    return ReplayLog(args.replay_log) if args.replay_log else None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay episodes from a log without networks or neat.")
+    parser.add_argument('path')
+    parser.add_argument('--list', action='store_true', help="print the episodes in the log and exit")
+    parser.add_argument('--generation', type=int, default=None, help="generation to show; default the last episode")
+    parser.add_argument('--bird', type=int, default=None, metavar='KEY', help="show only the bird of this genome")
+    parser.add_argument('--tick', type=int, default=0, help="start at this tick")
+    parser.add_argument('--on-course', type=int, default=0, metavar='K',
+                        help="which course of a multi-course episode to show")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--output', metavar='PATH', help="write the replay to a video file instead of a window")
+    args = parser.parse_args()
+
+    replay = Replay(args.path)
+    if args.list:
+        for entry in replay.index:
+            print('generation {0:4d}: {1:5d} birds, {2:6d} ticks at byte {3}'.format(
+                entry['generation'], entry['birds'], entry['ticks'], entry['offset']))
+    else:
+        episode = replay.episode(len(replay) - 1 if args.generation is None else replay.find(args.generation))
+        show(episode, min(args.tick, episode.ticks), args.on_course, args.bird, args.fps, args.output)
@@ -0,0 +1,160 @@
+"""
+Live view of a simulation running at full speed.
+
+The simulation publishes a compact snapshot of every tick (bird ys, alive mask, pipes, score) into a
+ring buffer in shared memory and never waits. A display process reads the newest snapshot at its own
+frame rate and skips whatever it was too slow to show.
+"""
+from collections import namedtuple
+from multiprocessing import Process, shared_memory
+
+import numpy as np
+
+SLOTS = 8
+MAX_PIPES = 8
+
+Snapshot = namedtuple('Snapshot', 'seq episode score y alive pipes')
+
+
+def slot_dtype(birds):
+    return np.dtype([('seq', 'i8'), ('episode', 'i8'), ('score', 'i8'), ('birds', 'i8'), ('pipe_count', 'i8'),
+                     ('pipes', 'i4', (MAX_PIPES, 2)), ('y', 'f4', (birds,)), ('alive', '?', (birds,))])
+
+
+class SnapshotRing(object):
+    """
+    ``slots`` snapshots of up to ``birds`` birds. The writer overwrites the oldest slot, marking it
+    with the sequence number only once it is complete, so a reader that raced it retries instead of
+    seeing a torn snapshot. Without ``name`` a new block is created; with it an existing one is attached.
+    """
+
+    def __init__(self, birds, slots=SLOTS, name=None):
+        dtype = slot_dtype(birds)
+        self.capacity = birds
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=16 + slots * dtype.itemsize)
+        self.name = self.shm.name
+        # header[0] is the sequence number of the newest snapshot, header[1] is set once the writer is done.
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = np.ndarray((slots,), dtype=dtype, buffer=self.shm.buf, offset=16)
+        if name is None:
+            self.header[:] = 0
+            self.slots['seq'] = 0
+
+    def publish(self, episode, score, y, alive, pipes):
+        seq = int(self.header[0]) + 1
+        slot = seq % len(self.slots)
+        slots = self.slots
+        n = min(len(y), self.capacity)
+        slots['seq'][slot] = -1
+        slots['episode'][slot] = episode
+        slots['score'][slot] = score
+        slots['birds'][slot] = n
+        slots['y'][slot, :n] = y[:n]
+        slots['alive'][slot, :n] = alive[:n]
+        count = 0
+        for pipe in pipes:
+            if count == MAX_PIPES:
+                break
+            height = pipe.height
+            # With a CourseSet every bird has its own height; the first course's birds are the ones shown.
+            slots['pipes'][slot, count] = pipe.x, height if np.ndim(height) == 0 else height[0]
+            count += 1
+        slots['pipe_count'][slot] = count
+        slots['seq'][slot] = seq
+        self.header[0] = seq
+
+    def latest(self):
+        """ A copy of the newest complete snapshot, or None when nothing has been published yet. """
+        slots = self.slots
+        for _ in range(3):
+            seq = int(self.header[0])
+            if seq == 0:
+                return None
+            slot = seq % len(slots)
+            if slots['seq'][slot] != seq:
+                continue
+            n = int(slots['birds'][slot])
+            snapshot = Snapshot(seq, int(slots['episode'][slot]), int(slots['score'][slot]),
+                                slots['y'][slot, :n].copy(), slots['alive'][slot, :n].copy(),
+                                slots['pipes'][slot, :slots['pipe_count'][slot]].tolist())
+            if slots['seq'][slot] == seq:
+                return snapshot
+        return None
+
+    @property
+    def finished(self):
+        return bool(self.header[1])
+
+    def finish(self):
+        self.header[1] = 1
+
+    def close(self, unlink=False):
+        del self.header, self.slots
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def view(name, birds, slots=SLOTS, fps=30):
+    """ Display process: draws the newest snapshot with the pygame renderer until the window is closed. """
+    import pygame
+
+    from engine import Pipe
+    from flappy_bird import PygameRenderer
+
+    ring = SnapshotRing(birds, slots, name)
+    renderer = PygameRenderer("Flappy Bird (live)")
+    renderer.open()
+    clock = pygame.time.Clock()
+    shown = skipped = 0
+    last = None
+    while not ring.finished:
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        snapshot = ring.latest()
+        if snapshot is not None and snapshot.seq != last:
+            if last is not None:
+                skipped += snapshot.seq - last - 1
+            last = snapshot.seq
+            shown += 1
+            pipes = [Pipe(x, height) for x, height in snapshot.pipes]
+            renderer.render(snapshot.y[snapshot.alive], pipes, snapshot.score, snapshot.episode)
+        clock.tick(fps)
+    ring.close()
+    renderer.close()
+    print('Live view showed {0} ticks and skipped {1}'.format(shown, skipped))
+
+
+class LiveView(object):
+    """
+    Owns the ring and the display process. Simulations call ``new_episode`` once and ``publish`` every tick;
+    neither waits for the display. ``watching`` turns False once the window is closed.
+    """
+
+    def __init__(self, birds, fps=30, slots=SLOTS):
+        self.ring = SnapshotRing(birds, slots)
+        self.episode = 0
+        self.process = Process(target=view, args=(self.ring.name, birds, slots, fps), daemon=True)
+        self.process.start()
+
+    def new_episode(self):
+        self.episode += 1
+
+    def publish(self, score, y, alive, pipes):
+        self.ring.publish(self.episode, score, y, alive, pipes)
+
+    @property
+    def watching(self):
+        return self.process.is_alive()
+
+    def close(self):
+        self.ring.finish()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close(unlink=True)
+
+
+def add_arguments(parser):
+    parser.add_argument('--live', action='store_true',
+                        help="train at full speed and watch the newest tick in a separate display process")
@@ -0,0 +1,79 @@
+"""
+Per-generation training statistics, streamed to a JSON-lines file instead of kept in memory.
+
+``neat.StatisticsReporter`` holds a copy of every generation's best genome and every species size for the
+whole run. ``StatsLog`` writes one line per generation and keeps nothing, so a run of any length costs the
+same memory. ``read`` picks up where the previous call stopped, which is how *visualize.py* follows a
+running log without reading it from the start every time.
+"""
+import json
+import time
+
+import numpy as np
+
+from instrumentation import Reporter
+
+
+class StatsLog(Reporter):
+    """
+    Appends a record per generation to ``path``: the fitness distribution, the best genome's key, fitness and
+    size, the size of every species, and the seconds since the generation started. Reporters passed to
+    ``include`` add the fields of their ``record()``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', buffering=1)
+        self.generation = None
+        self.started = None
+        self.sources = []
+
+    def include(self, source):
+        self.sources.append(source)
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.started = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitness = np.array([genome.fitness for genome in population.values()], dtype=np.float64)
+        record = {
+            'generation': self.generation,
+            'best': best_genome.fitness,
+            'mean': float(fitness.mean()),
+            'stdev': float(fitness.std()),
+            'min': float(fitness.min()),
+            'best_key': best_genome.key,
+            'best_nodes': len(best_genome.nodes),
+            'best_connections': sum(1 for gene in best_genome.connections.values() if gene.enabled),
+            'species': {str(sid): len(s.members) for sid, s in species.species.items()},
+            'seconds': time.perf_counter() - self.started,
+        }
+        for source in self.sources:
+            record.update(source.record())
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def read(path, offset=0):
+    """
+    The records written after byte ``offset`` and the offset to pass next time. A line still being
+    written is left for the next call.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return records, offset + end
+
+
+def add_arguments(parser):
+    parser.add_argument('--stats', metavar='PATH', help="append per-generation statistics to PATH as JSON lines, "
+                                                        "for 'python visualize.py PATH'")
+
+
+def from_args(args):
+    return StatsLog(args.stats) if args.stats else None
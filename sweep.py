@@ -0,0 +1,297 @@
+"""
+Hyperparameter sweeps: many headless training runs over variants of config-feedforward.txt and the game constants.
+
+A parameter is either a NEAT config key, written ``key`` or ``Section.key`` when the name alone is ambiguous,
+or an upper-case constant of *engine.py* such as ``PIPE_GAP`` or ``PIPE_VEL``. Each trial trains a seeded
+population on a fixed course in its own worker process, until the config's fitness threshold is reached or its
+generation or time budget runs out. Trials report their best fitness after every generation, and one that is
+below the median of the other trials at the same generation is stopped, so the pool moves on to the next trial.
+"""
+import configparser
+import contextlib
+import io
+import itertools
+import os
+import queue
+import random
+import tempfile
+import time
+from multiprocessing import Array, Pool, Queue
+
+import champion
+import courses
+import engine
+from instrumentation import Reporter
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config-feedforward.txt')
+COLUMNS = ('trial', 'seed', 'status', 'generations', 'best_fitness', 'wall_s')
+
+
+def parse_value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_param(spec):
+    """ ``KEY=a,b,c`` is a list of choices; ``KEY=lo:hi`` a range, which only random search can sample. """
+    key, sep, values = spec.partition('=')
+    if not sep or not values:
+        raise ValueError("Expected KEY=a,b,c or KEY=lo:hi, got {0!r}".format(spec))
+    if ':' in values:
+        lo, hi = (parse_value(value) for value in values.split(':', 1))
+        if isinstance(lo, str) or isinstance(hi, str):
+            raise ValueError("Range of {0} is not numeric: {1!r}".format(key, values))
+        return key, (lo, hi)
+    return key, [parse_value(value) for value in values.split(',')]
+
+
+def resolve(parser, key):
+    """ The (section, option) of a config key, or (None, name) for an engine constant. """
+    if key.isupper():
+        if not isinstance(getattr(engine, key, None), (int, float)):
+            raise ValueError("engine.py has no numeric constant {0}".format(key))
+        return None, key
+    section, sep, option = key.rpartition('.')
+    found = [section] if sep else [name for name in parser.sections() if parser.has_option(name, option)]
+    if len(found) != 1 or not parser.has_option(found[0], option):
+        raise ValueError("{0} is {1} in {2}".format(key, 'ambiguous' if found else 'not an option', CONFIG_PATH))
+    return found[0], option
+
+
+def grid(params):
+    """ Every combination of the choices, in order. """
+    for key, values in params:
+        if isinstance(values, tuple):
+            raise ValueError("{0} is a range; pass --samples to search it at random".format(key))
+    keys = [key for key, values in params]
+    for combination in itertools.product(*(values for key, values in params)):
+        yield dict(zip(keys, combination))
+
+
+def sample(params, count, rng):
+    """ ``count`` random draws: a choice uniformly, a range uniformly, in integers when both ends are. """
+    for _ in range(count):
+        drawn = {}
+        for key, values in params:
+            if not isinstance(values, tuple):
+                drawn[key] = rng.choice(values)
+            elif all(isinstance(value, int) for value in values):
+                drawn[key] = rng.randint(*values)
+            else:
+                drawn[key] = rng.uniform(*values)
+        yield drawn
+
+
+class StopTrial(Exception):
+    pass
+
+
+class TrialReporter(Reporter):
+    """ Sends the best fitness so far after each generation and ends the trial when asked to or out of time. """
+
+    def __init__(self, index, seconds=None):
+        self.index = index
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        self.best = None
+        self.generations = 0
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.generations += 1
+        if self.best is None or best_genome.fitness > self.best:
+            self.best = best_genome.fitness
+        _progress.put((self.index, self.generations, self.best))
+        if self.best >= config.fitness_threshold:
+            return
+        if _stop[self.index]:
+            raise StopTrial('stopped')
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise StopTrial('timeout')
+
+
+_progress = None
+_stop = None
+
+
+def _init_worker(progress, stop):
+    global _progress, _stop
+    _progress, _stop = progress, stop
+
+
+def run_trial(index, values, seed, course_state, generations, seconds=None, config_path=CONFIG_PATH):
+    """
+    Runs in a worker: trains with ``values`` applied and returns a row of the results table. Workers serve one
+    trial each, so the engine constants set here never leak into the next trial.
+    """
+    import neat
+
+    parser = configparser.ConfigParser()
+    parser.read(config_path)
+    for key, value in values.items():
+        section, option = resolve(parser, key)
+        if section is None:
+            setattr(engine, option, value)
+        else:
+            parser.set(section, option, str(value))
+    with tempfile.TemporaryDirectory(prefix='flappy-sweep-') as tmp:
+        path = os.path.join(tmp, 'config.txt')
+        with open(path, 'w') as f:
+            parser.write(f)
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation, path)
+        # Finished genomes are exported as they are found; keep them away from the real best.npz.
+        champion.BEST_PATH = os.path.join(tmp, 'best.npz')
+        course = courses.from_state(course_state)
+        reporter = TrialReporter(index, seconds)
+        random.seed(seed)
+        population = neat.Population(config)
+        population.add_reporter(reporter)
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                population.run(lambda genomes, config: engine.eval_genomes(genomes, config, course=course),
+                               generations)
+            solved = reporter.best is not None and reporter.best >= config.fitness_threshold
+            status = 'solved' if solved else 'budget'
+        except StopTrial as e:
+            status = str(e)
+        except neat.CompleteExtinctionException:
+            status = 'extinct'
+    return {
+        'trial': index,
+        'seed': seed,
+        'status': status,
+        # Generations to the threshold when solved, else the generations played.
+        'generations': reporter.generations,
+        'best_fitness': reporter.best,
+        'wall_s': time.perf_counter() - start,
+        'values': values,
+    }
+
+
+def behind(curves, index, generation, grace=5, peers=3):
+    """
+    The median stopping rule: True when trial ``index`` has a lower best fitness at ``generation`` than the
+    median of at least ``peers`` other trials there. A trial that ended earlier counts with its last best.
+    """
+    if generation < grace:
+        return False
+    others = sorted(curve[min(generation, len(curve)) - 1] for other, curve in curves.items()
+                    if other != index and curve)
+    if len(others) < peers:
+        return False
+    middle = len(others) // 2
+    median = others[middle] if len(others) % 2 else (others[middle - 1] + others[middle]) / 2
+    return curves[index][generation - 1] < median
+
+
+def sweep(trials, course_state, generations, seconds=None, workers=None, grace=5, peers=3, report=print):
+    """
+    Runs every (values, seed) in ``trials`` across a process pool and returns the result rows in trial order.
+    ``grace`` generations pass before a trial can be stopped early; ``grace=None`` never stops one.
+    """
+    progress = Queue()
+    stop = Array('b', len(trials), lock=False)
+    curves = {}
+    rows = [None] * len(trials)
+    pool = Pool(workers, initializer=_init_worker, initargs=(progress, stop), maxtasksperchild=1)
+    try:
+        jobs = [pool.apply_async(run_trial, (index, values, seed, course_state, generations, seconds))
+                for index, (values, seed) in enumerate(trials)]
+        waiting = set(range(len(trials)))
+        while waiting:
+            try:
+                index, generation, best = progress.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            else:
+                curve = curves.setdefault(index, [])
+                del curve[generation - 1:]
+                curve.append(best)
+                if grace is not None and not stop[index] and behind(curves, index, generation, grace, peers):
+                    stop[index] = 1
+            for index in [index for index in waiting if jobs[index].ready()]:
+                waiting.discard(index)
+                rows[index] = jobs[index].get()
+                report(rows[index])
+    finally:
+        pool.terminate()
+        pool.join()
+    return rows
+
+
+def format_value(value):
+    return '{0:.4g}'.format(value) if isinstance(value, float) else str(value)
+
+
+def format_row(row, keys):
+    best = row['best_fitness']
+    return '{0:>5} {1:>6} {2:<8} {3:>11} {4:>12} {5:>8.1f}  {6}'.format(
+        row['trial'], row['seed'], row['status'], row['generations'], 'n/a' if best is None else '{0:.1f}'.format(best),
+        row['wall_s'], ' '.join('{0}={1}'.format(key, format_value(row['values'][key])) for key in keys))
+
+
+def write_csv(path, rows, keys):
+    import csv
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS + tuple(keys))
+        for row in rows:
+            writer.writerow([row[column] for column in COLUMNS] + [row['values'][key] for key in keys])
+
+
+def ranked(rows):
+    """ Solved trials by generations and then wall time, followed by the rest by best fitness. """
+    return sorted(rows, key=lambda row: (row['status'] != 'solved',
+                                         row['generations'] if row['status'] == 'solved' else 0,
+                                         -(row['best_fitness'] or 0), row['wall_s']))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train many config variants headlessly and tabulate the results.")
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUES', required=True,
+                        help="a config key or engine constant to vary, as KEY=a,b,c or, with --samples, KEY=lo:hi")
+    parser.add_argument('--samples', type=int, metavar='N', help="draw N random variants instead of the full grid")
+    parser.add_argument('--sweep-seed', type=int, default=0, help="seed of the random draws")
+    parser.add_argument('--repeats', type=int, default=1, help="population seeds per variant")
+    parser.add_argument('--generations', type=int, default=50, help="generation budget of each trial")
+    parser.add_argument('--seconds', type=float, help="time budget of each trial")
+    parser.add_argument('--workers', type=int, default=None, help="trials run at once; defaults to the CPU count")
+    parser.add_argument('--grace', type=int, default=5, help="generations before a trial can be stopped early")
+    parser.add_argument('--no-early-stop', action='store_true', help="run every trial to its budget")
+    parser.add_argument('--output', metavar='PATH', help="write the results table as CSV")
+    courses.add_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is None and not args.course:
+        # Trials are only comparable on the same pipes.
+        args.seed = 1
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    try:
+        params = [parse_param(spec) for spec in args.param]
+        for key, values in params:
+            resolve(config, key)
+        variants = list(sample(params, args.samples, random.Random(args.sweep_seed)) if args.samples
+                        else grid(params))
+    except ValueError as e:
+        parser.error(str(e))
+    keys = [key for key, values in params]
+    trials = [(values, seed) for values in variants for seed in range(1, args.repeats + 1)]
+    print('{0} trials of up to {1} generations'.format(len(trials), args.generations))
+    print('{0:>5} {1:>6} {2:<8} {3:>11} {4:>12} {5:>8}  {6}'.format(*COLUMNS + ('values',)))
+
+    start = time.perf_counter()
+    rows = sweep(trials, courses.to_state(courses.from_args(args)), args.generations, args.seconds, args.workers,
+                 None if args.no_early_stop else args.grace, report=lambda row: print(format_row(row, keys)))
+    print('\nFinished in {0:.1f} sec; best first:'.format(time.perf_counter() - start))
+    for row in ranked(rows)[:10]:
+        print(format_row(row, keys))
+    if args.output:
+        write_csv(args.output, ranked(rows), keys)
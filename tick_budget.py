@@ -0,0 +1,84 @@
+"""
+Fewer network queries per generation: a decision interval and a tick cap that grows with the population.
+
+With a decision interval of k, birds query their network on every k-th tick only and repeat that decision,
+jump or not, on the ticks in between, so a generation runs about k times fewer activations. The tick cap
+ends an episode after that many ticks even if birds are still flying. Every generation that reaches the cap
+multiplies it by the growth factor, up to a limit, so the cap rises only as fast as the population improves.
+"""
+import math
+
+from instrumentation import Reporter
+
+
+class TickBudget(Reporter):
+    """
+    The decision interval and tick cap that the simulations of a run read, and what they used each generation:
+    the longest episode, the activations and whether the cap cut an episode short.
+    """
+
+    def __init__(self, interval=1, cap=None, growth=1.0, limit=None):
+        self.interval = max(1, interval)
+        self.cap = cap
+        self.growth = growth
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.activations = 0
+        self.capped = False
+
+    def scope(self, key):
+        """ A fitness cache key that also tells apart episodes played with different intervals or caps. """
+        return None if key is None else (key, self.interval, self.cap)
+
+    def observe(self, ticks, activations, capped):
+        """ Adds one simulation; a generation may be several, on several courses or workers. """
+        self.ticks = max(self.ticks, ticks)
+        self.activations += activations
+        self.capped = self.capped or capped
+
+    def record(self):
+        return {
+            'decision_interval': self.interval,
+            'tick_cap': self.cap,
+            'ticks': self.ticks,
+            'activations': self.activations,
+            'capped': self.capped,
+        }
+
+    def start_generation(self, generation):
+        self.reset()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        print('Decisions every {0} ticks: {1:,} activations over {2} ticks{3}'.format(
+            self.interval, self.activations, self.ticks,
+            '' if self.cap is None else ', cap {0}{1}'.format(self.cap, ' reached' if self.capped else '')))
+
+    def end_generation(self, config, population, species_set):
+        if self.capped and self.cap is not None and self.growth > 1:
+            cap = int(math.ceil(self.cap * self.growth))
+            self.cap = cap if self.limit is None else min(cap, self.limit)
+
+
+def add_arguments(parser, cap=True):
+    """ With ``cap`` False only the decision interval is offered, for frontends that play without a cap. """
+    group = parser.add_argument_group("decision budget")
+    group.add_argument('--decision-interval', type=int, metavar='K',
+                       help="query the networks every K ticks and repeat the decision in between; the champion is "
+                            "watched with the K it was trained with unless this is given")
+    if not cap:
+        parser.set_defaults(tick_cap=None, cap_growth=1.5, cap_limit=None)
+        return
+    group.add_argument('--tick-cap', type=int, metavar='N', help="end every episode after N ticks")
+    group.add_argument('--cap-growth', type=float, default=1.5, metavar='F',
+                       help="multiply the cap by F after each generation that reaches it")
+    group.add_argument('--cap-limit', type=int, metavar='N', help="never raise the cap above N ticks")
+
+
+def from_args(args):
+    interval = 1 if args.decision_interval is None else args.decision_interval
+    if interval <= 1 and args.tick_cap is None:
+        return None
+    return TickBudget(interval, args.tick_cap, args.cap_growth, args.cap_limit)
@@ -1,15 +1,38 @@
 from __future__ import print_function
 
 import copy
+import hashlib
+import importlib
+import os
+import shutil
+import tempfile
 import warnings
 
-import graphviz
-import matplotlib.pyplot as plt
 import numpy as np
 
+# matplotlib backend used on first plot; None keeps matplotlib's default (or $MPLBACKEND), 'Agg' needs no display.
+MATPLOTLIB_BACKEND = None
+# Where draw_net keeps each rendered graph under a hash of its DOT source; None renders every time.
+DRAW_NET_CACHE = os.path.join(tempfile.gettempdir(), 'flappy-draw-net')
+
+_modules = {}
+
+
+def _optional(name):
+    """ Imports an optional dependency on first use; returns None when it is not installed. """
+    if name not in _modules:
+        try:
+            if name == 'matplotlib.pyplot' and MATPLOTLIB_BACKEND is not None:
+                importlib.import_module('matplotlib').use(MATPLOTLIB_BACKEND)
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
+
 
 def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
     """ Plots the population's average and best fitness. """
+    plt = _optional('matplotlib.pyplot')
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
@@ -41,6 +64,11 @@ def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
 
 def plot_spikes(spikes, view=False, filename=None, title=None):
     """ Plots the trains for a single spiking neuron. """
+    plt = _optional('matplotlib.pyplot')
+    if plt is None:
+        warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
+        return
+
     t_values = [t for t, I, v, u, f in spikes]
     v_values = [v for t, I, v, u, f in spikes]
     u_values = [u for t, I, v, u, f in spikes]
@@ -90,6 +118,7 @@ def plot_spikes(spikes, view=False, filename=None, title=None):
 
 def plot_species(statistics, view=False, filename='speciation.svg'):
     """ Visualizes speciation throughout evolution. """
+    plt = _optional('matplotlib.pyplot')
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
@@ -113,10 +142,116 @@ def plot_species(statistics, view=False, filename='speciation.svg'):
     plt.close()
 
 
+class StatsPlots(object):
+    """
+    The figures of ``plot_stats`` and ``plot_species``, drawn from a ``stats_log`` file and kept up to date:
+    ``update`` reads only the records added since the last call and changes the existing lines. At most
+    ``max_points`` generations are kept; past that every other one is dropped and only every second new
+    one kept, so memory and drawing time stay the same however long the run gets.
+    """
+
+    def __init__(self, path, ylog=False, max_points=2000):
+        self.path = path
+        self.offset = 0
+        self.max_points = max_points
+        self.stride = 1
+        self.seen = 0
+        self.points = []
+        plt = _optional('matplotlib.pyplot')
+        if plt is None:
+            raise ImportError("StatsPlots needs matplotlib")
+        self.fitness_figure, ax = plt.subplots()
+        self.lines = {
+            'mean': ax.plot([], [], 'b-', label="average")[0],
+            'low': ax.plot([], [], 'g-.', label="-1 sd")[0],
+            'high': ax.plot([], [], 'g-.', label="+1 sd")[0],
+            'best': ax.plot([], [], 'r-', label="best")[0],
+        }
+        ax.set_title("Population's average and best fitness")
+        ax.set_xlabel("Generations")
+        ax.set_ylabel("Fitness")
+        ax.grid()
+        ax.legend(loc="best")
+        if ylog:
+            ax.set_yscale('symlog')
+        self.species_figure, self.species_axes = plt.subplots()
+
+    def add(self, record):
+        if self.seen % self.stride == 0:
+            self.points.append(record)
+            if len(self.points) > self.max_points:
+                del self.points[1::2]
+                self.stride *= 2
+        self.seen += 1
+
+    def update(self):
+        """ Reads the new records and redraws from them; returns how many there were. """
+        import stats_log
+
+        records, self.offset = stats_log.read(self.path, self.offset)
+        for record in records:
+            # Only the generation number and the numbers that are plotted are kept.
+            self.add({key: record[key] for key in ('generation', 'best', 'mean', 'stdev', 'species')})
+        if records:
+            self.draw()
+        return len(records)
+
+    def draw(self):
+        generation = np.array([point['generation'] for point in self.points])
+        mean = np.array([point['mean'] for point in self.points])
+        stdev = np.array([point['stdev'] for point in self.points])
+        for name, values in (('mean', mean), ('low', mean - stdev), ('high', mean + stdev),
+                             ('best', [point['best'] for point in self.points])):
+            self.lines[name].set_data(generation, values)
+        ax = self.lines['mean'].axes
+        ax.relim()
+        ax.autoscale_view()
+
+        # Stacked like plot_species, but each species only spans the generations it lived in, since over a
+        # long run there are many more species than are alive at any one time.
+        spans = {}
+        for i, point in enumerate(self.points):
+            for sid, size in point['species'].items():
+                spans.setdefault(int(sid), []).append((i, size))
+        # All of them go into one collection, as drawing time is mostly per artist.
+        base = np.zeros(len(self.points))
+        polygons = []
+        for sid in sorted(spans):
+            first, last = spans[sid][0][0], spans[sid][-1][0]
+            sizes = np.zeros(last - first + 1)
+            for i, size in spans[sid]:
+                sizes[i - first] = size
+            x = generation[first:last + 1]
+            bottom = base[first:last + 1].copy()
+            base[first:last + 1] += sizes
+            polygons.append(np.concatenate([np.column_stack([x, bottom]),
+                                            np.column_stack([x, bottom + sizes])[::-1]]))
+        matplotlib = _optional('matplotlib')
+        colors = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+        ax = self.species_axes
+        ax.clear()
+        ax.add_collection(matplotlib.collections.PolyCollection(
+            polygons, facecolors=[colors[i % len(colors)] for i in range(len(polygons))]))
+        ax.autoscale_view()
+        ax.set_title("Speciation")
+        ax.set_ylabel("Size per Species")
+        ax.set_xlabel("Generations")
+
+    def save(self, fitness='avg_fitness.svg', species='speciation.svg'):
+        self.fitness_figure.savefig(fitness)
+        self.species_figure.savefig(species)
+
+    def close(self):
+        plt = _optional('matplotlib.pyplot')
+        plt.close(self.fitness_figure)
+        plt.close(self.species_figure)
+
+
 def draw_net(config, genome, view=False, filename=None, node_names=None, show_disabled=True, prune_unused=False,
              node_colors=None, fmt='svg'):
     """ Receives a genome and draws a neural network with arbitrary topology. """
     # Attributes for network nodes.
+    graphviz = _optional('graphviz')
     if graphviz is None:
         warnings.warn("This display is not available due to a missing optional dependency (graphviz)")
         return
@@ -192,6 +327,48 @@ def draw_net(config, genome, view=False, filename=None, node_names=None, show_di
             width = str(0.1 + abs(cg.weight / 5.0))
             dot.edge(a, b, _attributes={'style': style, 'color': color, 'penwidth': width})
 
-    dot.render(filename, view=view)
-
-    return dot
\ No newline at end of file
+    if DRAW_NET_CACHE is None:
+        dot.render(filename, view=view)
+        return dot
+
+    # The DOT source decides the picture, so a graph drawn before is copied instead of running graphviz again.
+    key = hashlib.sha1((fmt + '\n' + dot.source).encode('utf-8')).hexdigest()
+    cached = os.path.join(DRAW_NET_CACHE, key + '.' + fmt)
+    if not os.path.exists(cached):
+        os.makedirs(DRAW_NET_CACHE, exist_ok=True)
+        dot.render(os.path.join(DRAW_NET_CACHE, key), cleanup=True)
+    output = dot.save(filename) + '.' + fmt
+    shutil.copyfile(cached, output)
+    if view:
+        graphviz.view(output)
+
+    return dot
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Plot fitness and speciation from a --stats log.")
+    parser.add_argument('path', help="log written with --stats")
+    parser.add_argument('--fitness', default='avg_fitness.svg', help="fitness plot to write")
+    parser.add_argument('--species', default='speciation.svg', help="speciation plot to write")
+    parser.add_argument('--ylog', action='store_true')
+    parser.add_argument('--follow', type=float, metavar='SECONDS',
+                        help="keep reading the log and rewrite the plots every SECONDS while it grows")
+    args = parser.parse_args()
+
+    MATPLOTLIB_BACKEND = 'Agg'
+    plots = StatsPlots(args.path, args.ylog)
+    try:
+        while True:
+            if plots.update():
+                plots.save(args.fitness, args.species)
+                print('Plotted {0} generations'.format(plots.seen))
+            if args.follow is None:
+                break
+            time.sleep(args.follow)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        plots.close()
\ No newline at end of file